@@ -6,6 +6,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi_mcp import FastApiMCP
 
 from core.config import settings
+from services.video_service import close_http_client, shutdown_frame_pool
 from routers import (
     health_router,
     documents_router,
@@ -104,6 +105,8 @@ async def startup_event():
 async def shutdown_event():
     """Called on application shutdown."""
     logger.info(" Ragie Backend API shutting down...")
+    await close_http_client()
+    shutdown_frame_pool()
 
 
 
@@ -0,0 +1,35 @@
+-- Migration: Finalize a processed video in one round-trip
+-- Description: Inserts the video's chunk rows and marks the ragie_documents
+-- record with its final status atomically, so a failure part-way through
+-- can't leave chunks stored against a document that never became ready
+
+CREATE OR REPLACE FUNCTION finalize_video_processing(
+    p_document_id UUID,
+    p_status TEXT,
+    p_chunks JSONB
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_chunk_count INTEGER := COALESCE(jsonb_array_length(p_chunks), 0);
+BEGIN
+    IF v_chunk_count > 0 THEN
+        INSERT INTO video_chunks (
+            user_id, ragie_chunk_id, ragie_document_id, chunk_index,
+            start_time, end_time, audio_transcript, video_description, thumbnail_url
+        )
+        SELECT
+            user_id, ragie_chunk_id, ragie_document_id, chunk_index,
+            start_time, end_time, audio_transcript, video_description, thumbnail_url
+        FROM jsonb_populate_recordset(NULL::video_chunks, p_chunks);
+    END IF;
+
+    -- updated_at is maintained by ragie_documents_update_updated_at_trigger
+    UPDATE ragie_documents
+    SET status = p_status,
+        processing_error = NULL,
+        chunk_count = COALESCE(NULLIF(v_chunk_count, 0), chunk_count)
+    WHERE id = p_document_id;
+
+    RETURN v_chunk_count;
+END;
+$$ LANGUAGE plpgsql;
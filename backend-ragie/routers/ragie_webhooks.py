@@ -15,6 +15,7 @@ from core.config import settings
 from core.deps import get_supabase_for_webhook, get_ragie_service
 from core.sse import get_sse_manager, SSEManager
 from services.ragie_service import RagieService
+from services.video_service import VideoService
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/ragie-webhooks", tags=["ragie-webhooks"])
@@ -172,7 +173,7 @@ async def ragie_webhook(
             # Update document status in database
             # Find the ragie_documents record by ragie_document_id
             doc_response = supabase.table("ragie_documents").select(
-                "id, user_id"
+                "id, user_id, storage_bucket"
             ).eq("ragie_document_id", str(document_id)).execute()
 
             if doc_response.data and len(doc_response.data) > 0:
@@ -194,74 +195,32 @@ async def ragie_webhook(
                 elif status == "failed":
                     update_data["processing_error"] = payload.get("error", "Processing failed")
 
-                # If status is "ready", retrieve chunks and store them in database
+                # If status is "ready", retrieve chunks and store them in database;
+                # finalize_after_ragie also records the status in the same round-trip
+                finalized = False
                 if status == "ready":
                     try:
-                        # Get the full document to access user_id and storage info
-                        full_doc = supabase.table("ragie_documents").select(
-                            "user_id, storage_bucket, storage_path"
-                        ).eq("id", doc_local_id).single().execute()
-
-                        if full_doc.data:
-                            user_id = full_doc.data["user_id"]
-                            storage_bucket = full_doc.data.get("storage_bucket")
-                            storage_path = full_doc.data.get("storage_path")
-
-                            # Retrieve chunks from Ragie for this document
-                            chunks_response = await ragie_service.retrieve(
-                                query="",  # Get all chunks for this document
-                                user_id=user_id,
-                                top_k=1000,  # Retrieve all chunks
-                                rerank=False
-                            )
-
-                            # Filter chunks for this document
-                            doc_chunks = [
-                                chunk for chunk in chunks_response.scored_chunks
-                                if chunk.document_id == document_id
-                            ]
-
-                            # Get thumbnail path if it's a video
-                            thumbnail_path = None
-                            if storage_bucket == "videos":
-                                thumbnail_path = f"thumbnails/{doc_local_id}.jpg"
-
-                            # Store chunks in database
-                            chunk_records = []
-                            for i, chunk in enumerate(doc_chunks):
-                                # Extract timing info from chunk metadata for videos
-                                start_time = 0
-                                end_time = 0
-                                if hasattr(chunk, "metadata") and chunk.metadata:
-                                    start_time = chunk.metadata.get("start_time", 0)
-                                    end_time = chunk.metadata.get("end_time", 0)
-
-                                chunk_record = {
-                                    "user_id": user_id,
-                                    "ragie_chunk_id": chunk.chunk_id,
-                                    "ragie_document_id": str(document_id),
-                                    "chunk_index": i,
-                                    "start_time": start_time,
-                                    "end_time": end_time,
-                                    "audio_transcript": chunk.text if hasattr(chunk, "text") else "",
-                                    "video_description": chunk.metadata.get("video_description", "") if (hasattr(chunk, "metadata") and chunk.metadata) else "",
-                                    "thumbnail_url": thumbnail_path if (i == 0 and thumbnail_path) else None
-                                }
-                                chunk_records.append(chunk_record)
-
-                            if chunk_records:
-                                supabase.table("video_chunks").insert(chunk_records).execute()
-                                update_data["chunk_count"] = len(chunk_records)
-                                logger.info(f"Stored {len(chunk_records)} chunks for document {document_id}")
+                        video_service = VideoService(supabase, ragie_service)
+                        chunk_count = await video_service.finalize_after_ragie(
+                            video_id=doc_local_id,
+                            ragie_document_id=document_id,
+                            user_id=doc["user_id"],
+                            storage_bucket=doc.get("storage_bucket"),
+                            status=status,
+                        )
+                        if chunk_count:
+                            update_data["chunk_count"] = chunk_count
+                        finalized = True
 
                     except Exception as e:
                         logger.error(f"Error retrieving chunks for document {document_id}: {e}")
                         # Don't fail the webhook - document is ready even if chunk storage fails
                         # The document status will be updated, but chunk_count may remain zero
 
-                supabase.table("ragie_documents").update(update_data).eq(
-                    "id", doc_local_id
-                ).execute()
+                if not finalized:
+                    supabase.table("ragie_documents").update(update_data).eq(
+                        "id", doc_local_id
+                    ).execute()
 
                 logger.info(f"Updated document {doc_local_id} status to {status}")
 
@@ -12,7 +12,7 @@ from core import get_current_user, AuthUser
 from core.deps import get_supabase, get_supabase_admin, get_ragie_service
 from core.sse import get_sse_manager, SSEManager
 from core.user_limits import check_user_can_upload, add_to_user_monthly_throughput, add_to_user_monthly_file_count
-from services.video_service import VideoService
+from services.video_service import VideoService, close_http_client
 from services.ragie_service import RagieService
 from schemas.video import (
     VideoUploadResponse,
@@ -34,9 +34,9 @@ def _process_video_background(
     thumbnail_path: Optional[str]
 ):
     """Sync wrapper for async video processing (for background tasks)."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
         loop.run_until_complete(
             video_service.process_video_with_ragie(
                 video_id=video_id,
@@ -47,6 +47,10 @@ def _process_video_background(
         )
     except Exception as e:
         logger.error(f"Background task failed for video {video_id}: {e}")
+    finally:
+        # The shared httpx client is per event loop; close it along with the loop
+        loop.run_until_complete(close_http_client())
+        loop.close()
 
 
 def get_video_service(current_user: AuthUser = Depends(get_current_user), supabase: Client = Depends(get_supabase_admin), ragie_service: RagieService = Depends(get_ragie_service)) -> VideoService:
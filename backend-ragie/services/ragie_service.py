@@ -1,5 +1,6 @@
 """Ragie API service wrapper."""
 
+import io
 import logging
 from typing import Optional
 from fastapi import UploadFile
@@ -47,9 +48,6 @@ class RagieService:
             ragie_metadata.update(metadata)
 
         try:
-            # Read file content
-            content = await file.read()
-
             # Determine appropriate mode based on file type
             mime_type = file.content_type or ""
             if mime_type.startswith("video/"):
@@ -62,6 +60,13 @@ class RagieService:
                 # Text and document files: use fast mode
                 mode = "fast"
 
+            # The SDK only accepts bytes or a real open() file (io.BufferedReader);
+            # stream the latter, read anything else (e.g. a SpooledTemporaryFile)
+            if isinstance(file.file, io.BufferedReader):
+                content = file.file
+            else:
+                content = await file.read()
+
             # Upload to Ragie
             response = self.client.documents.create(
                 request={
@@ -81,6 +86,67 @@ class RagieService:
             logger.error(f"Error uploading document: {e}")
             raise
 
+    async def upload_document_from_url(
+        self,
+        url: str,
+        filename: str,
+        user_id: str,
+        group_id: Optional[str] = None,
+        metadata: Optional[dict] = None,
+        mime_type: Optional[str] = None,
+    ):
+        """
+        Have Ragie ingest a document directly from a URL.
+
+        Avoids downloading the file here only to upload it again.
+
+        Args:
+            url: URL Ragie can fetch the file from (e.g. a signed storage URL)
+            filename: Original filename, used as the document name
+            user_id: User ID for metadata
+            group_id: Optional group ID for organization
+            metadata: Optional additional metadata
+            mime_type: MIME type of the file, used to pick the processing mode
+
+        Returns:
+            Ragie document response
+        """
+        ragie_metadata = {
+            "user_id": user_id,
+            "original_filename": filename,
+        }
+
+        if group_id:
+            ragie_metadata["group_id"] = group_id
+
+        if metadata:
+            ragie_metadata.update(metadata)
+
+        try:
+            mime_type = mime_type or ""
+            if mime_type.startswith("video/"):
+                mode = {"video": "audio_video"}
+            elif mime_type.startswith("audio/"):
+                mode = {"audio": True}
+            else:
+                mode = "fast"
+
+            response = self.client.documents.create_document_from_url(
+                request={
+                    "url": url,
+                    "name": filename,
+                    "metadata": ragie_metadata,
+                    "mode": mode
+                }
+            )
+
+            logger.info(f"Created document {response.id} from URL for user {user_id}")
+            return response
+
+        except Exception as e:
+            logger.error(f"Error creating document from URL: {e}")
+            raise
+
     async def retrieve(
         self,
         query: str,
@@ -90,6 +156,7 @@ class RagieService:
         group_id: Optional[str] = None,
         max_chunks_per_document: int = 0,
         modality: Optional[str] = None,
+        document_ids: Optional[list[str]] = None,
     ):
         """
         Retrieve document chunks from Ragie.
@@ -102,6 +169,7 @@ class RagieService:
             group_id: Optional group ID for scoped search
             max_chunks_per_document: Max chunks per document
             modality: Optional filter by content type (text, image, video, audio)
+            document_ids: Optional Ragie document IDs to restrict the search to
 
         Returns:
             Ragie retrieval response
@@ -115,6 +183,9 @@ class RagieService:
         if modality:
             filter_dict["chunk_content_type"] = {"$eq": modality}
 
+        if document_ids:
+            filter_dict["document_id"] = {"$in": document_ids}
+
         try:
             response = self.client.retrievals.retrieve(
                 request={
@@ -4,18 +4,319 @@ import logging
 import tempfile
 import os
 import asyncio
-from typing import Optional
+import time
+import random
+import weakref
+import multiprocessing
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from typing import TYPE_CHECKING, AsyncIterator, Optional, Union
 from fastapi import UploadFile
 from supabase import Client
 from .ragie_service import RagieService
 from core.config import settings
-import cv2
-import numpy as np
 from io import BytesIO
 import uuid
+import httpx
+from urllib.parse import quote
+
+if TYPE_CHECKING:
+    import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Settings are fixed for the life of the process; resolve the mode once
+_WEBHOOK_ENABLED: bool = bool(getattr(settings, "ragie_webhook_secret", None))
+
+# OpenCV is only needed when ffmpeg is unavailable, so it is imported on first
+# use rather than adding its import time to every worker
+_cv2 = None
+
+
+def _get_cv2():
+    """Import and configure OpenCV on first use."""
+    global _cv2
+    if _cv2 is None:
+        # setNumThreads doesn't reach the libavcodec decoder VideoCapture opens,
+        # which otherwise starts a thread per core for each capture
+        os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "threads;1")
+        import cv2
+
+        # Thumbnail extraction decodes a single frame; OpenCV's worker pool only adds
+        # thread oversubscription when several uploads extract frames concurrently
+        cv2.setNumThreads(0)
+        cv2.ocl.setUseOpenCL(False)
+        _cv2 = cv2
+    return _cv2
+
+# Read/stream videos in 1 MiB windows rather than holding the whole file in memory
+_STREAM_CHUNK_SIZE = 1 << 20
+
+
+# Spool videos up to this size to tmpfs when it has room, keeping the temp file
+# shared by the Storage upload, frame extraction and Ragie handoff in RAM
+_TMPFS_DIR = "/dev/shm"
+_TMPFS_MAX_BYTES = 256 << 20
+
+
+def _spool_dir(size: Optional[int]) -> Optional[str]:
+    """Pick the temp directory for spooling a video of the given size."""
+    if size is None or size > _TMPFS_MAX_BYTES or not os.path.isdir(_TMPFS_DIR):
+        return None
+    try:
+        # Leave headroom: /dev/shm is often small in containers (64 MiB in Docker)
+        if shutil.disk_usage(_TMPFS_DIR).free < 2 * size:
+            return None
+    except OSError:
+        return None
+    return _TMPFS_DIR
+
+
+# Small uploads are also kept in memory for a short while so the background
+# Ragie submission in this process doesn't have to read them back from disk
+_CACHED_VIDEO_MAX_BYTES = 64 << 20
+_CACHED_VIDEO_TOTAL_BYTES = 128 << 20
+_CACHED_VIDEO_TTL = 600.0
+_cached_videos: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+_cached_video_bytes = 0
+# Background processing runs on its own event loop, possibly in another thread
+_cached_videos_lock = threading.Lock()
+
+
+def _cache_video_bytes(doc_id: str, data: bytes) -> None:
+    """Keep an uploaded video's bytes for the Ragie handoff within the total byte budget."""
+    global _cached_video_bytes
+    now = time.monotonic()
+    with _cached_videos_lock:
+        # Entries whose handoff never happened would otherwise sit here until evicted
+        for key in [k for k, (expires, _) in _cached_videos.items() if expires < now]:
+            _cached_video_bytes -= len(_cached_videos.pop(key)[1])
+        if doc_id in _cached_videos:
+            _cached_video_bytes -= len(_cached_videos.pop(doc_id)[1])
+        _cached_videos[doc_id] = (now + _CACHED_VIDEO_TTL, data)
+        _cached_video_bytes += len(data)
+        while _cached_video_bytes > _CACHED_VIDEO_TOTAL_BYTES:
+            _, (_, evicted) = _cached_videos.popitem(last=False)
+            _cached_video_bytes -= len(evicted)
+
+
+def _pop_cached_video_bytes(doc_id: str) -> Optional[bytes]:
+    """Take an uploaded video's bytes out of the cache if still fresh."""
+    global _cached_video_bytes
+    with _cached_videos_lock:
+        entry = _cached_videos.pop(doc_id, None)
+        if entry is None:
+            return None
+        _cached_video_bytes -= len(entry[1])
+    if entry[0] < time.monotonic():
+        return None
+    return entry[1]
+
+
+# One pooled AsyncClient per event loop: connections are bound to the loop that
+# opened them, and background processing runs on its own loop
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the shared httpx client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(None, connect=10.0),
+            limits=httpx.Limits(max_keepalive_connections=64),
+        )
+        _http_clients[loop] = client
+    return client
+
+
+async def close_http_client() -> None:
+    """Close the shared httpx client for the running event loop, if any."""
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+# Frame extraction runs in worker processes so OpenCV decoding of concurrent
+# uploads doesn't compete with the event loop for the GIL. Spawned rather than
+# forked, since the API process is multi-threaded.
+_frame_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_frame_pool() -> ProcessPoolExecutor:
+    """Return the frame extraction process pool, creating it on first use."""
+    global _frame_pool
+    if _frame_pool is None:
+        _frame_pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _frame_pool
+
+
+def shutdown_frame_pool() -> None:
+    """Shut down the frame extraction process pool, if it was started."""
+    global _frame_pool
+    if _frame_pool is not None:
+        _frame_pool.shutdown(wait=False, cancel_futures=True)
+        _frame_pool = None
+
+
+async def _iter_file(path: str, chunk_size: int = _STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield a file's contents in chunks, reading off the event loop."""
+    loop = asyncio.get_running_loop()
+    with open(path, "rb") as f:
+        while True:
+            chunk = await loop.run_in_executor(None, f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+_FFMPEG = shutil.which("ffmpeg")
+
+# PyTurboJPEG (libjpeg-turbo) is optional; cv2.imencode is used when it or the
+# native library isn't available
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _TJ: Optional["TurboJPEG"] = TurboJPEG()
+except Exception:
+    _TJ = None
+
+
+def _encode_jpeg(frame: "np.ndarray", quality: int = 85) -> Optional[bytes]:
+    """Encode a BGR frame as JPEG, preferring libjpeg-turbo when installed."""
+    if _TJ is not None:
+        try:
+            return _TJ.encode(frame, quality=quality, pixel_format=TJPF_BGR)
+        except Exception as e:
+            logger.warning(f"TurboJPEG encode failed, falling back to OpenCV: {e}")
+
+    cv2 = _get_cv2()
+    success, jpeg_bytes = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not success:
+        return None
+    return jpeg_bytes.tobytes()
+
+
+def _extract_frame_at_ffmpeg(video_path: str, second_index: float) -> Optional[bytes]:
+    """
+    Decode one frame with ffmpeg and return it as a 640px-wide JPEG.
+
+    ffmpeg scales and encodes in one pass and writes the JPEG to stdout, so no
+    full-size frame is materialised in Python.
+
+    Args:
+        video_path: Path to the video file on disk
+        second_index: Timestamp of the frame in seconds
+
+    Returns:
+        JPEG-encoded image bytes or None if extraction fails
+    """
+    # -ss before -i seeks on the demuxer instead of decoding up to the timestamp,
+    # and skipping non-keyframes takes the first keyframe at or after it without
+    # decoding the frames in between (the first frame is always a keyframe)
+    seek = ["-skip_frame", "nokey", "-ss", str(second_index)] if second_index > 0 else []
+    try:
+        result = subprocess.run(
+            [
+                _FFMPEG, "-nostdin", "-loglevel", "error", "-threads", "1",
+                *seek,
+                "-i", video_path,
+                "-frames:v", "1",
+                "-vf", "scale='min(640,iw)':-2",
+                "-q:v", "3",
+                "-f", "image2", "-c:v", "mjpeg", "pipe:1",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=60,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"ffmpeg frame extraction failed: {e}")
+        return None
+
+    if result.returncode != 0 or not result.stdout:
+        logger.warning(f"ffmpeg frame extraction failed: {result.stderr.decode(errors='replace').strip()}")
+        return None
+
+    return result.stdout
+
+
+def _extract_frame_at(video_path: str, second_index: float = 0) -> Optional[bytes]:
+    """
+    Extract the frame at a given second from a video file.
+
+    Uses ffmpeg when it is installed and falls back to OpenCV otherwise.
+    Module-level so it can run in the frame extraction process pool.
+
+    Args:
+        video_path: Path to the video file on disk
+        second_index: Timestamp of the frame in seconds
+
+    Returns:
+        JPEG-encoded image bytes or None if extraction fails
+    """
+    if _FFMPEG:
+        jpeg_bytes = _extract_frame_at_ffmpeg(video_path, second_index)
+        if jpeg_bytes:
+            return jpeg_bytes
+
+    try:
+        # Open video with OpenCV
+        cv2 = _get_cv2()
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            logger.warning("Failed to open video with OpenCV")
+            return None
+
+        try:
+            # grab() only demuxes; decode just the target frame with retrieve()
+            fps = cap.get(cv2.CAP_PROP_FPS) or 0
+            for _ in range(int(second_index * fps)):
+                if not cap.grab():
+                    break
+            ret = cap.grab()
+            ret, frame = cap.retrieve() if ret else (False, None)
+        finally:
+            cap.release()
+
+        if not ret or frame is None:
+            logger.warning(f"Failed to read frame at {second_index}s from video")
+            return None
+
+        # Resize frame to reasonable thumbnail size (e.g., 640x360); frames
+        # that are already small enough are encoded as-is
+        height, width = frame.shape[:2]
+        thumb_width = 640
+        if width > thumb_width:
+            thumb_height = int(thumb_width * height / width)
+            frame = cv2.resize(frame, (thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+
+        # Encode frame as JPEG
+        jpeg_bytes = _encode_jpeg(frame)
+
+        if not jpeg_bytes:
+            logger.warning("Failed to encode frame as JPEG")
+            return None
+
+        return jpeg_bytes
+
+    except Exception as e:
+        logger.error(f"Error extracting frame: {e}")
+        return None
+
+
+def _extract_first_frame(video_path: str) -> Optional[bytes]:
+    """Extract the first frame from a video file as a JPEG thumbnail."""
+    return _extract_frame_at(video_path, 0)
+
 
 class VideoService:
     """Handles video uploads to Supabase and Ragie processing."""
@@ -24,61 +325,84 @@ class VideoService:
         self.supabase = supabase
         self.ragie_service = ragie_service
 
-    def _extract_first_frame(self, video_bytes: bytes) -> Optional[bytes]:
+    async def _storage_upload(
+        self,
+        path: str,
+        data: Union[bytes, AsyncIterator[bytes]],
+        content_type: str,
+        content_length: Optional[int] = None,
+    ) -> None:
         """
-        Extract the first frame from video bytes.
+        Upload an object to the videos bucket via the Storage REST API.
 
-        Args:
-            video_bytes: Raw video file bytes
+        The supabase SDK client is synchronous, so calling it from a coroutine
+        blocks the event loop for the whole upload.
 
-        Returns:
-            JPEG-encoded image bytes or None if extraction fails
+        Args:
+            path: Object path inside the videos bucket
+            data: Object body, either bytes or an async iterator of chunks
+            content_type: MIME type of the object
+            content_length: Body size, required when streaming chunks
         """
-        try:
-            # Write bytes to temporary file for OpenCV
-            temp_video = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-            temp_video.write(video_bytes)
-            temp_video.close()
-
-            # Open video with OpenCV
-            cap = cv2.VideoCapture(temp_video.name)
-            if not cap.isOpened():
-                logger.warning("Failed to open video with OpenCV")
-                return None
-
-            # Read first frame
-            ret, frame = cap.read()
-            cap.release()
-
-            if not ret or frame is None:
-                logger.warning("Failed to read first frame from video")
-                return None
+        url = f"{settings.supabase_url}/storage/v1/object/videos/{quote(path)}"
+        headers = {
+            "Authorization": f"Bearer {settings.supabase_key}",
+            "apikey": settings.supabase_key,
+            "Content-Type": content_type,
+            "x-upsert": "true",
+        }
+        if content_length is not None:
+            headers["Content-Length"] = str(content_length)
+        response = await _get_http_client().post(url, content=data, headers=headers)
+        response.raise_for_status()
+
+    async def _storage_remove(self, paths: list[str]) -> None:
+        """
+        Remove objects from the videos bucket in one Storage REST call.
 
-            # Resize frame to reasonable thumbnail size (e.g., 640x360)
-            height, width = frame.shape[:2]
-            aspect_ratio = width / height
-            thumb_width = 640
-            thumb_height = int(thumb_width / aspect_ratio)
-            frame = cv2.resize(frame, (thumb_width, thumb_height))
+        Args:
+            paths: Object paths inside the videos bucket
+        """
+        response = await _get_http_client().request(
+            "DELETE",
+            f"{settings.supabase_url}/storage/v1/object/videos",
+            json={"prefixes": paths},
+            headers={
+                "Authorization": f"Bearer {settings.supabase_key}",
+                "apikey": settings.supabase_key,
+            },
+        )
+        response.raise_for_status()
+
+    async def _undo_failed_upload(
+        self,
+        doc_id: str,
+        remove_record: bool,
+        storage_paths: list[str],
+    ) -> None:
+        """
+        Remove what a partially failed upload_video already wrote.
 
-            # Encode frame as JPEG
-            success, jpeg_bytes = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+        Cleanup failures are logged rather than raised so the original
+        upload error is the one reported.
 
-            # Clean up temp file
+        Args:
+            doc_id: ragie_documents ID of the failed upload
+            remove_record: Delete the ragie_documents row (it was inserted)
+            storage_paths: Objects in the videos bucket to remove
+        """
+        if remove_record:
             try:
-                os.unlink(temp_video.name)
+                await asyncio.to_thread(
+                    lambda: self.supabase.table("ragie_documents").delete().eq("id", doc_id).execute()
+                )
             except Exception as e:
-                logger.warning(f"Failed to clean up temp video file: {e}")
-
-            if not success:
-                logger.warning("Failed to encode frame as JPEG")
-                return None
-
-            return jpeg_bytes.tobytes()
-
-        except Exception as e:
-            logger.error(f"Error extracting first frame: {e}")
-            return None
+                logger.error(f"Failed to delete record for failed upload {doc_id}: {e}")
+        if storage_paths:
+            try:
+                await self._storage_remove(storage_paths)
+            except Exception as e:
+                logger.error(f"Failed to remove storage objects for failed upload {doc_id}: {e}")
 
     async def upload_video(
         self,
@@ -97,72 +421,163 @@ class VideoService:
         Returns:
             Dictionary with video metadata
         """
+        temp_file_path = None
         try:
-            # Get file content
-            file_content = await file.read()
-            file_size = len(file_content)
-
             # Validate file is MP4
             if file.content_type not in ["video/mp4", "application/octet-stream"]:
                 if not file.filename.endswith(".mp4"):
                     raise ValueError("Only MP4 videos are supported")
 
-            # Upload to Supabase Storage (pass raw bytes directly, like documents work)
+            # Generate the document ID client-side so the DB insert, storage upload
+            # and thumbnail extraction don't have to wait on each other
+            doc_id = str(uuid.uuid4())
             storage_path = f"{user_id}/{file.filename}"
+            loop = asyncio.get_running_loop()
+
+            # When the size is known up front, tee each chunk to Storage while it
+            # is being spooled instead of uploading from the temp file afterwards
+            upload_task = None
+            if file.size is not None:
+                chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=8)
+
+                async def _queued_chunks():
+                    while (queued := await chunk_queue.get()) is not None:
+                        yield queued
+
+                upload_task = asyncio.create_task(self._storage_upload(
+                    storage_path, _queued_chunks(), "video/mp4", content_length=file.size
+                ))
+
+                async def _feed_upload(item: Optional[bytes]) -> None:
+                    # Don't block on a full queue if the upload has already failed
+                    put = asyncio.ensure_future(chunk_queue.put(item))
+                    await asyncio.wait({put, upload_task}, return_when=asyncio.FIRST_COMPLETED)
+                    if not put.done():
+                        put.cancel()
+                        upload_task.result()
+                        raise Exception("Storage upload ended before the whole file was sent")
+
+            # Spool the upload to a temp file in chunks so the whole video is never
+            # resident in memory; the file is also reused for Ragie processing
+            file_size = 0
+            small_chunks: Optional[list[bytes]] = []
             try:
-                response = self.supabase.storage.from_("videos").upload(
-                    storage_path,
-                    file_content,
-                    file_options={"content-type": "video/mp4", "upsert": "true"}
-                )
-                if not response:
-                    raise Exception("Storage upload returned empty response")
-            except Exception as e:
-                logger.error(f"Storage upload failed: {e}")
-                raise Exception(f"Failed to upload video to storage: {str(e)}")
-
-            # Save bytes to temp file (to avoid re-downloading for Ragie processing)
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-            temp_file.write(file_content)
-            temp_file.close()
-            temp_file_path = temp_file.name
+                with tempfile.NamedTemporaryFile(
+                    delete=False, suffix=".mp4", dir=_spool_dir(file.size)
+                ) as temp_file:
+                    temp_file_path = temp_file.name
+                    while chunk := await file.read(_STREAM_CHUNK_SIZE):
+                        temp_file.write(chunk)
+                        file_size += len(chunk)
+                        if small_chunks is not None:
+                            if file_size <= _CACHED_VIDEO_MAX_BYTES:
+                                small_chunks.append(chunk)
+                            else:
+                                small_chunks = None
+                        if upload_task is not None:
+                            await _feed_upload(chunk)
+                    if upload_task is not None:
+                        await _feed_upload(None)
+            except Exception:
+                if upload_task is not None and not upload_task.done():
+                    upload_task.cancel()
+                raise
             logger.info(f"Saved video to temp file: {temp_file_path}")
 
-            # Create database record in ragie_documents
-            # Note: ragie_document_id will be updated after Ragie upload completes
-            doc_record = self.supabase.table("ragie_documents").insert({
-                "user_id": user_id,
-                "group_id": group_id,
-                "filename": file.filename,
-                "mime_type": file.content_type or "video/mp4",
-                "file_size_bytes": file_size,
-                "status": "pending",
-                "source": "upload",
-                "storage_bucket": "videos",
-                "storage_path": storage_path
-            }).execute()
-
-            if not doc_record.data:
-                raise Exception("Failed to create document record in database")
+            async def _upload_to_storage():
+                try:
+                    if upload_task is not None:
+                        await upload_task
+                    else:
+                        await self._storage_upload(
+                            storage_path,
+                            _iter_file(temp_file_path),
+                            "video/mp4",
+                            content_length=file_size,
+                        )
+                except Exception as e:
+                    logger.error(f"Storage upload failed: {e}")
+                    raise Exception(f"Failed to upload video to storage: {str(e)}")
 
-            doc = doc_record.data[0]
+            async def _make_thumbnail() -> Optional[str]:
+                try:
+                    frame_bytes = await loop.run_in_executor(
+                        _get_frame_pool(), _extract_first_frame, temp_file_path
+                    )
+                except Exception as e:
+                    logger.warning(f"Frame extraction worker failed: {e}")
+                    return None
 
-            # Extract and upload first frame as thumbnail (now we have the document ID)
-            thumbnail_path = None
-            frame_bytes = self._extract_first_frame(file_content)
-            if frame_bytes:
+                if not frame_bytes:
+                    return None
+
+                # Upload first frame as thumbnail; the path only depends on doc_id,
+                # so this doesn't wait for the video upload or the DB insert
                 try:
                     # Use ragie_documents.id as thumbnail name for easy lookup during search
-                    thumbnail_path = f"thumbnails/{doc['id']}.jpg"
-                    self.supabase.storage.from_("videos").upload(
-                        thumbnail_path,
-                        frame_bytes,
-                        file_options={"content-type": "image/jpeg", "upsert": "true"}
-                    )
+                    thumbnail_path = f"thumbnails/{doc_id}.jpg"
+                    await self._storage_upload(thumbnail_path, frame_bytes, "image/jpeg")
                     logger.info(f"Thumbnail uploaded to: {thumbnail_path}")
+                    return thumbnail_path
                 except Exception as e:
                     logger.warning(f"Failed to upload thumbnail: {e}")
                     # Continue without thumbnail, don't fail the upload
+                    return None
+
+            def _insert_record():
+                # Create database record in ragie_documents
+                # Note: ragie_document_id will be updated after Ragie upload completes
+                return self.supabase.table("ragie_documents").insert({
+                    "id": doc_id,
+                    "user_id": user_id,
+                    "group_id": group_id,
+                    "filename": file.filename,
+                    "mime_type": file.content_type or "video/mp4",
+                    "file_size_bytes": file_size,
+                    "status": "pending",
+                    "source": "upload",
+                    "storage_bucket": "videos",
+                    "storage_path": storage_path
+                }).execute()
+
+            # Storage upload (network-bound), DB insert and thumbnail extraction
+            # (CPU-bound) plus its upload are independent, so overlap them. All
+            # three always run to completion so a failure in one can be undone
+            # in the others below
+            thumbnail_path, upload_result, doc_record = await asyncio.gather(
+                _make_thumbnail(),
+                _upload_to_storage(),
+                loop.run_in_executor(None, _insert_record),
+                return_exceptions=True,
+            )
+
+            if isinstance(thumbnail_path, BaseException):
+                logger.warning(f"Thumbnail creation failed: {thumbnail_path}")
+                thumbnail_path = None
+
+            insert_error = doc_record if isinstance(doc_record, BaseException) else None
+            if insert_error is None and not doc_record.data:
+                insert_error = Exception("Failed to create document record in database")
+            upload_error = upload_result if isinstance(upload_result, BaseException) else None
+
+            if upload_error is not None or insert_error is not None:
+                await self._undo_failed_upload(
+                    doc_id,
+                    # Only remove what was actually written
+                    remove_record=insert_error is None,
+                    storage_paths=[
+                        path for path in (
+                            storage_path if upload_error is None else None,
+                            thumbnail_path,
+                        ) if path
+                    ],
+                )
+                raise upload_error or insert_error
+
+            doc = doc_record.data[0]
+
+            if small_chunks is not None:
+                _cache_video_bytes(doc_id, b"".join(small_chunks))
 
             logger.info(f"Video uploaded: {file.filename} for user {user_id}")
 
@@ -179,6 +594,11 @@ class VideoService:
 
         except Exception as e:
             logger.error(f"Error uploading video: {e}")
+            if temp_file_path:
+                try:
+                    os.unlink(temp_file_path)
+                except OSError:
+                    pass
             raise
 
     async def process_video_with_ragie(
@@ -194,11 +614,11 @@ class VideoService:
         If RAGIE_WEBHOOK_SECRET is configured (production):
         - Submits video to Ragie and returns immediately with status "partitioning"
         - Ragie calls webhook endpoint when processing completes
-        - Webhook updates status to "ready" and stores chunks
+        - Webhook calls finalize_after_ragie to store chunks and mark the video "ready"
 
         If RAGIE_WEBHOOK_SECRET is not configured (local development):
         - Submits video to Ragie and polls for completion
-        - Returns when status becomes "ready" (max 60 attempts, 30 min timeout)
+        - Returns when status becomes "ready" (exponential backoff, 30 min timeout)
 
         Args:
             video_id: Document ID (from ragie_documents) to process
@@ -209,34 +629,85 @@ class VideoService:
         Returns:
             Processing result dict with status and ragie_document_id
         """
+        result = await self.submit_to_ragie(video_id, user_id, temp_file_path)
+
+        # Check if webhook is configured
+        if _WEBHOOK_ENABLED:
+            # Production: Webhook will handle processing updates
+            logger.info(f"Video {video_id} submitted to Ragie (doc_id: {result['ragie_document_id']}). Webhook will handle processing updates.")
+            return result
+
+        # Local development: Poll for completion
+        logger.info(f"Video {video_id} submitted to Ragie. Polling for completion (no webhook configured)...")
+        return await self._poll_document_status(video_id, user_id, result["ragie_document_id"])
+
+    async def submit_to_ragie(
+        self,
+        video_id: str,
+        user_id: str,
+        temp_file_path: Optional[str] = None,
+    ) -> dict:
+        """
+        Submit a video to Ragie and return without waiting for processing.
+
+        The ragie_documents row records the Ragie document ID, which is what the
+        webhook uses to find the video again once Ragie has finished.
+
+        Args:
+            video_id: Document ID (from ragie_documents) to process
+            user_id: User ID (for RLS)
+            temp_file_path: Path to temporary video file (to avoid re-downloading)
+
+        Returns:
+            Dict with document_id, ragie_document_id and status "partitioning"
+        """
+        video_stream = None
         try:
-            # Get ragie_documents record
-            doc_response = self.supabase.table("ragie_documents").select(
-                "*"
-            ).eq("id", video_id).eq("user_id", user_id).single().execute()
+            # Mark as processing; the update returns the ragie_documents record,
+            # so no separate SELECT is needed
+            doc_response = self.supabase.table("ragie_documents").update({
+                "status": "partitioning"
+            }).eq("id", video_id).eq("user_id", user_id).execute()
 
             if not doc_response.data:
                 raise Exception(f"Document {video_id} not found")
 
-            doc = doc_response.data
+            doc = doc_response.data[0]
 
-            # Update status to processing
-            self.supabase.table("ragie_documents").update({
-                "status": "partitioning"
-            }).eq("id", video_id).execute()
+            ragie_metadata = {"original_storage_path": doc["storage_path"]}
 
-            # Read video from temp file or download from storage
-            from io import BytesIO
-            from fastapi import UploadFile
-
-            if temp_file_path and os.path.exists(temp_file_path):
-                # Use cached temp file (avoid re-downloading)
+            # Use a local copy of the video when this process still has one
+            video_bytes = _pop_cached_video_bytes(video_id)
+            if video_bytes is not None:
+                # Handed off in memory by upload_video in this process
+                logger.info(f"Using in-memory copy of video {video_id}")
+                video_stream, video_size = BytesIO(video_bytes), len(video_bytes)
+            elif temp_file_path and os.path.exists(temp_file_path):
+                # Use cached temp file (avoid re-downloading); hand Ragie the open
+                # file rather than reading the whole video into memory here
                 logger.info(f"Reading video from temp file: {temp_file_path}")
-                with open(temp_file_path, "rb") as f:
-                    video_bytes = f.read()
+                video_stream = open(temp_file_path, "rb")
+                video_size = os.path.getsize(temp_file_path)
+
+            if video_stream is not None:
+                # Create an UploadFile object for Ragie
+                video_file = UploadFile(
+                    file=video_stream,
+                    size=video_size,
+                    filename=doc["filename"],
+                    headers={"content-type": "video/mp4"}
+                )
+
+                # Send to Ragie for processing
+                ragie_doc = await self.ragie_service.upload_document(
+                    file=video_file,
+                    user_id=user_id,
+                    metadata=ragie_metadata
+                )
             else:
-                # Fallback: download from Supabase Storage
-                logger.info(f"Downloading video from storage: {doc['storage_path']}")
+                # Fallback: let Ragie fetch the video from Supabase Storage itself
+                # rather than downloading it here only to upload it again
+                logger.info(f"Submitting video to Ragie by URL: {doc['storage_path']}")
                 signed_url = self.supabase.storage.from_("videos").create_signed_url(
                     path=doc["storage_path"],
                     expires_in=3600
@@ -244,53 +715,30 @@ class VideoService:
                 if not signed_url:
                     raise Exception("Failed to create signed URL")
 
-                import httpx
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(signed_url["signedURL"])
-                    response.raise_for_status()
-                    video_bytes = response.content
-
-            # Create an UploadFile object for Ragie
-            video_file = UploadFile(
-                file=BytesIO(video_bytes),
-                size=len(video_bytes),
-                filename=doc["filename"],
-                headers={"content-type": "video/mp4"}
-            )
-
-            # Send to Ragie for processing
-            ragie_doc = await self.ragie_service.upload_document(
-                file=video_file,
-                user_id=user_id,
-                metadata={"original_storage_path": doc["storage_path"]}
-            )
-
-            # Store Ragie document ID in database
-            # Status is already "partitioning" from earlier update
-            self.supabase.table("ragie_documents").update({
-                "ragie_document_id": str(ragie_doc.id)
-            }).eq("id", video_id).execute()
+                ragie_doc = await self.ragie_service.upload_document_from_url(
+                    url=signed_url["signedURL"],
+                    filename=doc["filename"],
+                    user_id=user_id,
+                    metadata=ragie_metadata,
+                    mime_type="video/mp4"
+                )
 
             # Calculate page_count from file size (100MB = 5 pages)
             file_size_mb = doc["file_size_bytes"] / (1024 * 1024)
             page_count = max(1, round(file_size_mb / 20 * 5))
+
+            # Store Ragie document ID and page count in one update
+            # Status is already "partitioning" from earlier update
             self.supabase.table("ragie_documents").update({
+                "ragie_document_id": str(ragie_doc.id),
                 "page_count": page_count
             }).eq("id", video_id).execute()
 
-            # Check if webhook is configured
-            if settings.ragie_webhook_secret:
-                # Production: Webhook will handle processing updates
-                logger.info(f"Video {video_id} submitted to Ragie (doc_id: {ragie_doc.id}). Webhook will handle processing updates.")
-                return {
-                    "document_id": video_id,
-                    "ragie_document_id": str(ragie_doc.id),
-                    "status": "partitioning"
-                }
-            else:
-                # Local development: Poll for completion
-                logger.info(f"Video {video_id} submitted to Ragie. Polling for completion (no webhook configured)...")
-                return await self._poll_document_status(video_id, user_id, str(ragie_doc.id))
+            return {
+                "document_id": video_id,
+                "ragie_document_id": str(ragie_doc.id),
+                "status": "partitioning"
+            }
 
         except Exception as e:
             logger.error(f"Error processing video with Ragie: {e}")
@@ -304,6 +752,9 @@ class VideoService:
             raise
 
         finally:
+            if video_stream is not None:
+                video_stream.close()
+
             # Clean up temp file if it exists
             if temp_file_path and os.path.exists(temp_file_path):
                 try:
@@ -312,29 +763,103 @@ class VideoService:
                 except Exception as e:
                     logger.warning(f"Failed to clean up temp file {temp_file_path}: {e}")
 
+    async def finalize_after_ragie(
+        self,
+        video_id: str,
+        ragie_document_id: str,
+        user_id: str,
+        storage_bucket: Optional[str] = None,
+        status: str = "ready",
+    ) -> int:
+        """
+        Store Ragie's chunks for a processed document and mark it finished.
+
+        Called from the Ragie webhook once a document reaches "ready". The chunk
+        insert and the ragie_documents status/chunk_count update happen in one
+        finalize_video_processing RPC, so they succeed or fail together.
+
+        Args:
+            video_id: Document ID (from ragie_documents)
+            ragie_document_id: Ragie document ID
+            user_id: Owner of the document
+            storage_bucket: Storage bucket of the original file
+            status: Final status to record on the document
+
+        Returns:
+            Number of chunk rows stored
+        """
+        # Retrieve chunks from Ragie, filtered server-side to this document
+        ragie_document_id = str(ragie_document_id)
+        chunks_response = await self.ragie_service.retrieve(
+            query="",  # Get all chunks for this document
+            user_id=user_id,
+            top_k=1000,  # Retrieve all chunks
+            rerank=False,
+            document_ids=[ragie_document_id]
+        )
+        doc_chunks = chunks_response.scored_chunks
+
+        # Get thumbnail path if it's a video
+        thumbnail_path = None
+        if storage_bucket == "videos":
+            thumbnail_path = f"thumbnails/{video_id}.jpg"
+
+        # Store chunks in database (timing info comes from chunk metadata for videos)
+        chunk_records = [
+            {
+                "user_id": user_id,
+                "ragie_chunk_id": chunk.chunk_id,
+                "ragie_document_id": ragie_document_id,
+                "chunk_index": i,
+                "start_time": md.get("start_time", 0),
+                "end_time": md.get("end_time", 0),
+                "audio_transcript": getattr(chunk, "text", ""),
+                "video_description": md.get("video_description", ""),
+                "thumbnail_url": thumbnail_path if i == 0 else None
+            }
+            for i, chunk in enumerate(doc_chunks)
+            for md in (getattr(chunk, "metadata", None) or {},)
+        ]
+
+        self.supabase.rpc("finalize_video_processing", {
+            "p_document_id": video_id,
+            "p_status": status,
+            "p_chunks": chunk_records,
+        }).execute()
+        logger.info(f"Stored {len(chunk_records)} chunks for document {ragie_document_id}")
+
+        return len(chunk_records)
+
     async def _poll_document_status(
         self,
         video_id: str,
         user_id: str,
         ragie_document_id: str,
-        max_attempts: int = 60,
-        poll_interval: int = 30
+        initial_interval: float = 2.0,
+        max_interval: float = 30.0,
+        total_timeout: float = 1800.0
     ) -> dict:
         """
         Poll Ragie for document processing completion (local development fallback).
 
+        Without a webhook, Ragie is the only source of status changes, so there is
+        nothing for a Supabase Realtime subscription on ragie_documents to observe;
+        polling with backoff is the cheapest way to learn when a document is ready.
+
         Args:
             video_id: Local document ID
             user_id: User ID (for RLS)
             ragie_document_id: Ragie document ID
-            max_attempts: Maximum polling attempts (60 * 30s = 30 minutes max)
-            poll_interval: Seconds between polls
+            initial_interval: Seconds before the second poll (grows 1.5x after each poll)
+            max_interval: Upper bound on the delay between polls
+            total_timeout: Wall-clock budget in seconds (30 minutes max)
 
         Returns:
             Processing result dict with status and document info
         """
         attempt = 0
-        while attempt < max_attempts:
+        deadline = time.monotonic() + total_timeout
+        while True:
             attempt += 1
             try:
                 # Poll Ragie for status
@@ -373,25 +898,31 @@ class VideoService:
 
                 else:
                     # Still processing
-                    logger.info(f"Video {video_id} still processing (attempt {attempt}/{max_attempts}): {ragie_doc.status}")
+                    logger.info(f"Video {video_id} still processing (attempt {attempt}): {ragie_doc.status}")
 
             except Exception as e:
                 if "failed" in str(e).lower():
                     raise
                 logger.warning(f"Poll attempt {attempt} failed: {e}")
 
-            # Wait before next poll (except on last attempt)
-            if attempt < max_attempts:
-                await asyncio.sleep(poll_interval)
+            # Short jobs return fast, long jobs still poll sparingly; jitter keeps
+            # concurrent pollers from hitting Ragie in lockstep
+            delay = min(max_interval, initial_interval * (1.5 ** (attempt - 1))) + random.uniform(0, 1)
+
+            # Stop once the next sleep would overrun the wall-clock budget
+            if time.monotonic() + delay > deadline:
+                break
+
+            await asyncio.sleep(delay)
 
         # Timeout reached
-        logger.error(f"Video {video_id} polling timeout after {max_attempts} attempts ({max_attempts * poll_interval}s)")
+        logger.error(f"Video {video_id} polling timeout after {attempt} attempts ({total_timeout:.0f}s)")
         self.supabase.table("ragie_documents").update({
             "status": "failed",
-            "processing_error": f"Processing timeout after {max_attempts * poll_interval} seconds"
+            "processing_error": f"Processing timeout after {total_timeout:.0f} seconds"
         }).eq("id", video_id).execute()
 
-        raise Exception(f"Document processing timeout (max {max_attempts * poll_interval} seconds)")
+        raise Exception(f"Document processing timeout (max {total_timeout:.0f} seconds)")
 
     def get_signed_thumbnail_url(
         self,
@@ -489,9 +1020,12 @@ class VideoService:
                 raise Exception("Document not found or access denied")
 
             doc = doc_response.data
+            loop = asyncio.get_running_loop()
 
-            # Delete from Ragie if this document was processed with Ragie
-            if doc.get("ragie_document_id"):
+            async def _delete_from_ragie():
+                # Delete from Ragie if this document was processed with Ragie
+                if not doc.get("ragie_document_id"):
+                    return
                 try:
                     await self.ragie_service.delete_document(doc["ragie_document_id"])
                     logger.info(f"Deleted document {document_id} from Ragie")
@@ -499,43 +1033,31 @@ class VideoService:
                     logger.warning(f"Failed to delete document {document_id} from Ragie: {e}")
                     # Continue with storage and database deletion anyway
 
-            # Get all chunks to find thumbnail paths
-            chunks_response = self.supabase.table("video_chunks").select(
-                "thumbnail_url"
-            ).eq("ragie_document_id", document_id).execute()
-
-            chunks = chunks_response.data or []
-
-            # Collect all storage paths to delete
-            paths_to_delete = []
+            # Collect all storage paths to delete. Thumbnails are always stored as
+            # thumbnails/{document_id}.jpg (video_chunks rows reference the same path)
+            paths_to_delete = [f"thumbnails/{document_id}.jpg"]
             if doc.get("storage_path"):
                 paths_to_delete.append(doc["storage_path"])
 
-            # Add unique thumbnail paths from chunks
-            thumbnails = set()
-            for chunk in chunks:
-                if chunk.get("thumbnail_url"):
-                    thumbnails.add(chunk["thumbnail_url"])
-
-            paths_to_delete.extend(thumbnails)
-
-            # Also add the expected thumbnail path (in case video_chunks is empty or incomplete)
-            # Thumbnails are always stored as thumbnails/{document_id}.jpg
-            expected_thumbnail_path = f"thumbnails/{document_id}.jpg"
-            if expected_thumbnail_path not in paths_to_delete:
-                paths_to_delete.append(expected_thumbnail_path)
-
-            # Delete files from storage
-            if paths_to_delete:
+            async def _remove_from_storage():
+                # Delete files from storage
                 try:
-                    self.supabase.storage.from_("videos").remove(paths_to_delete)
+                    await self._storage_remove(paths_to_delete)
                     logger.info(f"Deleted {len(paths_to_delete)} files from storage for document {document_id}")
                 except Exception as e:
                     logger.warning(f"Failed to delete some files from storage: {e}")
                     # Continue with database deletion anyway
 
-            # Delete document (cascade delete will handle video_chunks)
-            self.supabase.table("ragie_documents").delete().eq("id", document_id).execute()
+            def _delete_record():
+                # Delete document (cascade delete will handle video_chunks)
+                self.supabase.table("ragie_documents").delete().eq("id", document_id).execute()
+
+            # Ragie, storage and record cleanup don't depend on each other
+            await asyncio.gather(
+                _delete_from_ragie(),
+                _remove_from_storage(),
+                loop.run_in_executor(None, _delete_record),
+            )
 
             logger.info(f"Deleted document {document_id} and all associated data")
 
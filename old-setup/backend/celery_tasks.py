@@ -1,6 +1,7 @@
 """Celery tasks for backend service (file ingestion, video processing, deletion)."""
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED
 from celery import shared_task
 from celery_app import celery_app
 from ingestion.ingest_common import ingest_file_content
@@ -61,13 +62,22 @@ def ingest_file(
 )
 def ingest_video(
     self,
-    file_content: bytes,
     filename: str,
     user_id: str,
     doc_id: str,
     storage_path: str,
+    mime_type: str = None,
+    group_id: str = None,
 ):
-    """Orchestrate video processing (send to video service via Celery)."""
+    """
+    Orchestrate video processing (send to video service via Celery).
+
+    The video itself is already in the "videos" bucket; only its storage path
+    goes through the broker, and the video worker downloads it from there.
+
+    The upload endpoint now enqueues celery_tasks.process_video directly; this
+    task only forwards work for callers that still dispatch it.
+    """
     try:
         logger.info(f"Starting video ingestion: doc_id={doc_id}, filename={filename}")
 
@@ -76,10 +86,10 @@ def ingest_video(
         video_task = celery_app.send_task(
             "celery_tasks.process_video",
             kwargs={
-                "file_content": file_content.hex() if isinstance(file_content, bytes) else file_content,
                 "filename": filename,
                 "user_id": user_id,
                 "doc_id": doc_id,
+                "storage_path": storage_path,
             },
             queue="video_queue",
         )
@@ -110,27 +120,64 @@ def delete_document(
         logger.info(f"Starting document deletion: doc_id={doc_id}, modality={modality}")
         
         from core.deps import get_supabase
-        from data_upload.pinecone_services import delete_vectors_by_ids
-        
+        from data_upload.pinecone_services import delete_vectors_by_filter, delete_vectors_by_ids
+
         supabase = get_supabase()
-        
-        # Get all vectors associated with this document
-        if modality == "text" or modality == "mixed":
-            # Delete from text index
-            delete_vectors_by_ids(doc_id, index_type="text")
-        
-        if modality == "image" or modality == "mixed":
-            # Delete from image index
-            delete_vectors_by_ids(doc_id, index_type="image")
-        
-        if modality == "video" or modality == "mixed":
-            # Delete from video index
-            delete_vectors_by_ids(doc_id, index_type="video")
-        
-        # Delete from database
-        supabase.table("app_doc_meta").delete().eq("doc_id", doc_id).execute()
-        supabase.table("app_text_chunks").delete().eq("doc_id", doc_id).execute()
-        
+
+        # Registered vector ids (joined to their chunks for the modality) must be
+        # read before the app_doc_meta delete cascades them away
+        rows = (supabase
+            .table("app_vector_registry")
+            .select("vector_id,app_chunks!inner(bucket,modality)")
+            .eq("app_chunks.doc_id", doc_id)
+            .eq("app_chunks.user_id", user_id)
+        ).execute().data or []
+
+        ids_by_modality: dict[str, list[str]] = {}
+        for r in rows:
+            chunk = r["app_chunks"]
+            chunk_modality = chunk.get("modality")
+            # Extracted images share the "image" chunk modality but have their own index
+            if chunk_modality == "image" and chunk.get("bucket") == "extracted-images":
+                chunk_modality = "extracted_image"
+            if chunk_modality in ("text", "image", "extracted_image"):
+                ids_by_modality.setdefault(chunk_modality, []).append(r["vector_id"])
+
+        # Each index delete is an independent network round-trip; run them together
+        with ThreadPoolExecutor(max_workers=len(ids_by_modality) + 2) as pool:
+            futures = [
+                pool.submit(delete_vectors_by_ids, ids=ids, modality=vector_modality, namespace=user_id)
+                for vector_modality, ids in ids_by_modality.items()
+            ]
+            if modality in ("video", "mixed"):
+                # Video frame and transcript vectors aren't registered; the video
+                # service tags them with video_id (= doc_id), so delete by that
+                futures += [
+                    pool.submit(
+                        delete_vectors_by_filter,
+                        metadata_filter={"video_id": {"$eq": doc_id}},
+                        modality=vector_modality,
+                        namespace=user_id,
+                    )
+                    for vector_modality in ("video_frame", "video_transcript")
+                ]
+            wait(futures, return_when=ALL_COMPLETED)
+        for future in futures:
+            future.result()  # Re-raise the first failure so the task retries
+
+        if modality == "video":
+            # The uploaded video queued for the video worker; already gone if it
+            # was processed, left behind if processing failed
+            doc_meta = supabase.table("app_doc_meta").select("bucket, storage_path").eq(
+                "doc_id", doc_id
+            ).eq("user_id", user_id).execute().data or []
+            for row in doc_meta:
+                if row.get("bucket") and row.get("storage_path"):
+                    supabase.storage.from_(row["bucket"]).remove([row["storage_path"]])
+
+        # Cascades to app_chunks, app_vector_registry and app_image_tags
+        supabase.table("app_doc_meta").delete().eq("doc_id", doc_id).eq("user_id", user_id).execute()
+
         logger.info(f"Document deletion completed: doc_id={doc_id}")
         return {"status": "deleted", "doc_id": doc_id}
         
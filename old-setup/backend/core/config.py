@@ -8,6 +8,10 @@ class Settings(BaseSettings):
     PINECONE_API_KEY: str | None = None  # Optional, will try PINECONE_KEY if not set
     EMBED_MODEL: str = "clip-ViT-B-32"
     EMBED_DIM: int = 512
+    # Ingestion embeds in mini-batches of this many inputs, with up to
+    # EMBED_MAX_CONCURRENCY batches running at once on worker threads
+    EMBED_PARALLEL_BATCH_SIZE: int = 256
+    EMBED_MAX_CONCURRENCY: int = 2
     API_PREFIX: str = "/api/v1"
 
     class Config:
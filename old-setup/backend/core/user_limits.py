@@ -2,7 +2,10 @@
 User limits and quota management for file uploads.
 """
 import logging
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 from fastapi import HTTPException
 
 logger = logging.getLogger(__name__)
@@ -11,6 +14,60 @@ DEFAULT_MAX_FILES = 50  # Free tier default
 PREMIUM_MAX_FILES = 100  # Premium tier (£2.99/month)
 MINUTES_PER_TOKEN = 5  # 5 minutes of video = 1 file token
 
+# Only the limit is cached; the token count is always read fresh so a burst
+# of uploads can't all pass the quota check against the same stale count
+MAX_FILES_CACHE_TTL = 30  # seconds; limits only change on plan changes
+LIMITS_CACHE_SIZE = 10_000
+
+
+class _TTLCache:
+    """Small thread-safe LRU cache whose entries expire after a fixed TTL."""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[int]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: int) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self._ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+_max_files_cache = _TTLCache(MAX_FILES_CACHE_TTL, LIMITS_CACHE_SIZE)
+
+
+def invalidate_user_limits(user_id: str) -> None:
+    """
+    Drop the cached file limit for a user.
+
+    Call this after changing a user's max_files or subscription so the new
+    tier is enforced immediately instead of after the cache TTL.
+
+    Args:
+        user_id: User ID whose cached values should be discarded
+    """
+    _max_files_cache.pop(user_id)
+
 
 def get_user_max_files(supabase, user_id: str) -> int:
     """
@@ -28,32 +85,79 @@ def get_user_max_files(supabase, user_id: str) -> int:
     Returns:
         Maximum number of files allowed (defaults to 50 for free tier)
     """
+    max_files = _max_files_cache.get(user_id)
+    if max_files is None:
+        max_files = _get_user_max_files_uncached(supabase, user_id)
+    return max_files
+
+
+def _get_user_max_files_uncached(supabase, user_id: str) -> int:
+    """Read max_files from user_settings and cache it on success."""
     try:
         response = supabase.table("user_settings").select("max_files, stripe_subscription_status").eq("user_id", user_id).execute()
 
         if response.data and len(response.data) > 0:
             settings = response.data[0]
-            max_files = settings.get("max_files", DEFAULT_MAX_FILES)
-
-            # Verify subscription status matches max_files
-            # This is a safety check in case of data inconsistency
-            subscription_status = settings.get("stripe_subscription_status")
-            if subscription_status in ["active", "trialing"]:
-                # Should be premium tier
-                if max_files < PREMIUM_MAX_FILES:
-                    logger.warning(f"User {user_id} has active subscription but max_files={max_files}, expected {PREMIUM_MAX_FILES}")
-                    return PREMIUM_MAX_FILES
-
-            return max_files
+            max_files = _resolve_max_files(
+                user_id,
+                settings.get("max_files", DEFAULT_MAX_FILES),
+                settings.get("stripe_subscription_status"),
+            )
+        else:
+            # If no settings exist, use default
+            max_files = DEFAULT_MAX_FILES
 
-        # If no settings exist, return default
-        return DEFAULT_MAX_FILES
+        _max_files_cache.set(user_id, max_files)
+        return max_files
     except Exception as e:
         logger.error(f"Error fetching user limits: {e}")
         # Return default on error to not block uploads
         return DEFAULT_MAX_FILES
 
 
+def _resolve_max_files(user_id: str, max_files: Optional[int], subscription_status: Optional[str]) -> int:
+    """Apply defaults and the subscription safety check to a stored max_files."""
+    if max_files is None:
+        max_files = DEFAULT_MAX_FILES
+
+    # Verify subscription status matches max_files
+    # This is a safety check in case of data inconsistency
+    if subscription_status in ["active", "trialing"]:
+        # Should be premium tier
+        if max_files < PREMIUM_MAX_FILES:
+            logger.warning(f"User {user_id} has active subscription but max_files={max_files}, expected {PREMIUM_MAX_FILES}")
+            return PREMIUM_MAX_FILES
+
+    return max_files
+
+
+def _fetch_upload_quota(supabase, user_id: str) -> Tuple[int, int]:
+    """
+    Get a user's consumed file tokens and file limit in one round-trip.
+
+    Uses the can_user_upload RPC, which returns the maintained token total,
+    limit and subscription status from the user's user_settings row.
+
+    Args:
+        supabase: Supabase client
+        user_id: User ID to check
+
+    Returns:
+        Tuple of (current_count, max_files)
+    """
+    try:
+        response = supabase.rpc("can_user_upload", {"uid": user_id}).execute()
+        row = response.data[0] if response.data else {}
+        current_count = row.get("current_count") or 0
+        max_files = _resolve_max_files(user_id, row.get("max_files"), row.get("status"))
+        _max_files_cache.set(user_id, max_files)
+        return current_count, max_files
+    except Exception as e:
+        logger.error(f"Error fetching upload quota: {e}")
+        # Fall back to the separate queries, which default rather than block uploads
+        return get_user_file_count(supabase, user_id), get_user_max_files(supabase, user_id)
+
+
 def calculate_video_tokens(duration_seconds: float) -> int:
     """
     Calculate the number of file tokens a video consumes based on its duration.
@@ -78,6 +182,9 @@ def get_user_file_count(supabase, user_id: str) -> int:
     For videos: tokens are calculated based on duration (5 minutes = 1 token)
     For other files: 1 token per file (default)
 
+    The total is kept in user_settings.file_tokens_used by triggers on
+    app_doc_meta, so this is a single primary-key lookup.
+
     Args:
         supabase: Supabase client
         user_id: User ID to check
@@ -86,15 +193,10 @@ def get_user_file_count(supabase, user_id: str) -> int:
         Total number of file tokens the user has consumed
     """
     try:
-        # Query all documents and sum their file_tokens
-        response = supabase.table("app_doc_meta").select("file_tokens").eq("user_id", user_id).execute()
-
-        if not response.data:
-            return 0
+        response = supabase.table("user_settings").select("file_tokens_used").eq("user_id", user_id).execute()
 
-        # Sum all file_tokens (default is 1 per file, higher for long videos)
-        total_tokens = sum(doc.get("file_tokens", 1) for doc in response.data)
-        return total_tokens
+        # No settings row means no documents have been inserted yet
+        return (response.data[0].get("file_tokens_used") or 0) if response.data else 0
     except Exception as e:
         logger.error(f"Error counting user file tokens: {e}")
         return 0
@@ -116,8 +218,7 @@ def check_user_can_upload_video(supabase, user_id: str, duration_seconds: float)
     Raises:
         HTTPException: 403 if user doesn't have enough tokens remaining
     """
-    current_count = get_user_file_count(supabase, user_id)
-    max_files = get_user_max_files(supabase, user_id)
+    current_count, max_files = _fetch_upload_quota(supabase, user_id)
     tokens_needed = calculate_video_tokens(duration_seconds)
 
     can_upload = (current_count + tokens_needed) <= max_files
@@ -168,8 +269,7 @@ def check_user_can_upload(supabase, user_id: str) -> dict:
     Raises:
         HTTPException: 403 if user has reached their limit
     """
-    current_count = get_user_file_count(supabase, user_id)
-    max_files = get_user_max_files(supabase, user_id)
+    current_count, max_files = _fetch_upload_quota(supabase, user_id)
 
     can_upload = current_count < max_files
     remaining = max(0, max_files - current_count)  # Ensure remaining is never negative
@@ -226,8 +326,7 @@ def get_user_quota_status(supabase, user_id: str) -> dict:
         - can_upload: Boolean indicating if new uploads are allowed
         - percentage_used: Percentage of quota used (capped at 100)
     """
-    current_count = get_user_file_count(supabase, user_id)
-    max_files = get_user_max_files(supabase, user_id)
+    current_count, max_files = _fetch_upload_quota(supabase, user_id)
 
     remaining = max(0, max_files - current_count)
     over_limit = max(0, current_count - max_files)
@@ -255,17 +354,34 @@ def ensure_user_settings_exist(supabase, user_id: str) -> None:
         supabase: Supabase client
         user_id: User ID to ensure settings for
     """
+    ensure_user_settings_exist_many(supabase, [user_id])
+
+
+def ensure_user_settings_exist_many(supabase, user_ids: List[str]) -> None:
+    """
+    Ensure user_settings records exist for many users in one round-trip.
+
+    Uses an upsert that ignores existing rows (ON CONFLICT DO NOTHING), so
+    there is no SELECT beforehand and concurrent callers cannot race.
+
+    Args:
+        supabase: Supabase client
+        user_ids: User IDs to ensure settings for
+    """
+    if not user_ids:
+        return
+
     try:
-        # Check if settings exist
-        response = supabase.table("user_settings").select("user_id").eq("user_id", user_id).execute()
-
-        if not response.data or len(response.data) == 0:
-            # Create default settings
-            supabase.table("user_settings").insert({
-                "user_id": user_id,
-                "max_files": DEFAULT_MAX_FILES
-            }).execute()
-            logger.info(f"Created default settings for user {user_id}")
+        response = supabase.table("user_settings").upsert(
+            [{"user_id": user_id, "max_files": DEFAULT_MAX_FILES} for user_id in dict.fromkeys(user_ids)],
+            on_conflict="user_id",
+            ignore_duplicates=True,
+        ).execute()
+
+        # Only newly inserted rows are returned
+        for row in response.data or []:
+            invalidate_user_limits(row["user_id"])
+            logger.info(f"Created default settings for user {row['user_id']}")
     except Exception as e:
         logger.error(f"Error ensuring user settings: {e}")
         # Don't raise - this is best effort
@@ -1,19 +1,31 @@
 # data_upload/pinecone_services.py
 
+import heapq
+import logging
 import os
-from typing import List, Dict, Any, Optional, Literal
-from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED, FIRST_COMPLETED
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Literal
+from datetime import datetime, timezone
+import requests
 from dotenv import load_dotenv
 from pinecone import Pinecone  # pinecone>=5
 
+from pinecone.grpc import PineconeGRPC  # HTTP/2 + protobuf data plane (pinecone[grpc])
+
+import orjson as _json  # Much faster on large fetch_by_metadata payloads
+
 # -------------------- Config --------------------
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 _PINECONE_KEY = os.getenv("PINECONE_API_KEY") or os.getenv("PINECONE_KEY")
 if not _PINECONE_KEY:
     raise RuntimeError("Missing PINECONE_API_KEY (or PINECONE_KEY).")
 
-pc = Pinecone(
+# Prefer the gRPC client for upsert/query/update/delete; set PINECONE_USE_GRPC=0 to force REST
+_client_cls = PineconeGRPC if os.getenv("PINECONE_USE_GRPC", "1") != "0" else Pinecone
+pc = _client_cls(
     api_key=_PINECONE_KEY,
     environment=os.getenv("PINECONE_ENVIRONMENT") or None,
 )
@@ -23,6 +35,10 @@ IMAGE_INDEX_NAME = os.getenv("PINECONE_IMAGE_INDEX_NAME")
 EXTRACTED_IMAGE_INDEX_NAME = os.getenv("PINECONE_EXTRACTED_IMAGE_INDEX_NAME")  # NEW
 VIDEO_FRAME_INDEX_NAME = os.getenv("PINECONE_VIDEO_FRAME_INDEX_NAME", "video-frames")
 VIDEO_TRANSCRIPT_INDEX_NAME = os.getenv("PINECONE_VIDEO_TRANSCRIPT_INDEX_NAME", "video-transcripts")
+# Optional sparse index mirroring the text index, used for server-side keyword search
+TEXT_SPARSE_INDEX_NAME = os.getenv("PINECONE_TEXT_SPARSE_INDEX_NAME")
+SPARSE_EMBED_MODEL = os.getenv("PINECONE_SPARSE_EMBED_MODEL", "pinecone-sparse-english-v0")
+SPARSE_EMBED_BATCH = 96  # Max inputs per inference request for the sparse model
 
 if not TEXT_INDEX_NAME:
     raise RuntimeError("Missing PINECONE_TEXT_INDEX_NAME.")
@@ -31,42 +47,45 @@ if not IMAGE_INDEX_NAME:
 if not EXTRACTED_IMAGE_INDEX_NAME:
     raise RuntimeError("Missing PINECONE_EXTRACTED_IMAGE_INDEX_NAME.")
 
-# Lazy init: create Index handles (deferred until first use to avoid startup failures)
-_text_index = None
-_image_index = None
-_extracted_image_index = None
-_video_frame_index = None
-_video_transcript_index = None
-
-def _get_text_index():
-    global _text_index
-    if _text_index is None:
-        _text_index = pc.Index(TEXT_INDEX_NAME)
-    return _text_index
-
-def _get_image_index():
-    global _image_index
-    if _image_index is None:
-        _image_index = pc.Index(IMAGE_INDEX_NAME)
-    return _image_index
-
-def _get_extracted_image_index():
-    global _extracted_image_index
-    if _extracted_image_index is None:
-        _extracted_image_index = pc.Index(EXTRACTED_IMAGE_INDEX_NAME)
-    return _extracted_image_index
-
-def _get_video_frame_index():
-    global _video_frame_index
-    if _video_frame_index is None:
-        _video_frame_index = pc.Index(VIDEO_FRAME_INDEX_NAME)
-    return _video_frame_index
-
-def _get_video_transcript_index():
-    global _video_transcript_index
-    if _video_transcript_index is None:
-        _video_transcript_index = pc.Index(VIDEO_TRANSCRIPT_INDEX_NAME)
-    return _video_transcript_index
+# Headers for raw REST calls to an index host (fetch_by_metadata)
+_REST_HEADERS = {
+    "Api-Key": _PINECONE_KEY,
+    "Content-Type": "application/json",
+    "X-Pinecone-API-Version": "2024-07"  # Required for pinecone-client>=5.x
+}
+
+_http_session = None
+
+def _get_http_session():
+    """Shared keep-alive session for raw Pinecone REST calls."""
+    global _http_session
+    if _http_session is None:
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.2,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=None,  # fetch_by_metadata is a read-only POST
+                raise_on_status=False,
+            ),
+        ))
+        _http_session = session
+    return _http_session
+
+_index_hosts: Dict[str, str] = {}
+
+def _host_for(index_name: str) -> str:
+    """Data-plane host for an index; looked up once per process."""
+    host = _index_hosts.get(index_name)
+    if host is None:
+        host = _index_hosts[index_name] = pc.describe_index(index_name).host
+    return host
 
 # Model dims
 TEXT_DIM = 384          # all-MiniLM-L12-v2
@@ -75,63 +94,226 @@ VIDEO_FRAME_DIM = 512   # CLIP ViT-B-32 for video frames
 VIDEO_TRANSCRIPT_DIM = 384  # all-MiniLM-L6-v2 for transcripts
 
 MAX_BATCH = int(os.getenv("PINECONE_MAX_BATCH", "100"))
+# Per-modality upsert batch sizes: text items carry large metadata strings,
+# image items are mostly floats with short paths
+PINECONE_TEXT_BATCH = int(os.getenv("PINECONE_TEXT_BATCH", "100"))
+PINECONE_IMAGE_BATCH = int(os.getenv("PINECONE_IMAGE_BATCH", "200"))
+# Pinecone rejects upsert requests over 2MB; keep some headroom for framing
+MAX_REQUEST_BYTES = int(2 * 1024 * 1024 * 0.9)
+# Rough encoded size of one float: packed in gRPC, decimal text over REST
+_FLOAT_BYTES = 4 if _client_cls is not Pinecone else 20
+POOL_THREADS = int(os.getenv("PINECONE_POOL_THREADS", "30"))
+
+# Shared pool for fanning out independent data-plane requests (batch upserts,
+# per-ID updates); threads start on first use and are reused across calls
+_pinecone_pool = ThreadPoolExecutor(max_workers=POOL_THREADS, thread_name_prefix="pinecone")
 
 Modality = Literal["text", "image", "clip_text", "extracted_image", "video_frame", "video_transcript"] 
 
+# modality -> (index name, dim). Both CLIP-image and CLIP-text embeddings
+# live in the same 512-D space.
+_MODALITY_INDEXES: Dict[str, tuple] = {
+    "text": (TEXT_INDEX_NAME, TEXT_DIM),
+    "image": (IMAGE_INDEX_NAME, IMAGE_TEXT_DIM),
+    "clip_text": (IMAGE_INDEX_NAME, IMAGE_TEXT_DIM),
+    "extracted_image": (EXTRACTED_IMAGE_INDEX_NAME, IMAGE_TEXT_DIM),
+    "video_frame": (VIDEO_FRAME_INDEX_NAME, VIDEO_FRAME_DIM),
+    "video_transcript": (VIDEO_TRANSCRIPT_INDEX_NAME, VIDEO_TRANSCRIPT_DIM),
+}
+
+# Index handles by name, opened on first use in each process. Nothing is opened
+# at import: the Celery prefork parent imports this module, and gRPC channels
+# (like pooled connections and threads) don't survive fork()
+_indexes: Dict[str, Any] = {}
+
+def _index_by_name(name: str):
+    index = _indexes.get(name)
+    if index is None:
+        index = _indexes[name] = pc.Index(name)
+    return index
+
+def _reset_after_fork() -> None:
+    """Drop handles inherited from the parent so the child opens its own."""
+    global _http_session, _pinecone_pool
+    _indexes.clear()
+    _http_session = None
+    _pinecone_pool = ThreadPoolExecutor(max_workers=POOL_THREADS, thread_name_prefix="pinecone")
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
 # -------------------- Utilities --------------------
 def _chunked(xs: list, n: int):
     for i in range(0, len(xs), n):
         yield xs[i:i+n]
 
 
+def _estimated_size(vector: Dict[str, Any]) -> int:
+    """Approximate request bytes for one vector item."""
+    return (
+        len(vector["id"])
+        + len(vector["values"]) * _FLOAT_BYTES
+        + len(_json.dumps(vector.get("metadata") or {}))
+    )
+
+
+def _upsert_batches(vectors: List[Dict[str, Any]], batch_size: int):
+    """Split vectors into batches of at most batch_size items and MAX_REQUEST_BYTES."""
+    batch, batch_bytes = [], 0
+    for v in vectors:
+        size = _estimated_size(v)
+        if batch and (len(batch) >= batch_size or batch_bytes + size > MAX_REQUEST_BYTES):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(v)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
 def _index_for_modality(modality: Modality):
-    if modality == "text":
-        return _get_text_index(), TEXT_DIM
-    # Both CLIP-image and CLIP-text embeddings live in the same 512-D space
-    if modality in ("image", "clip_text"):
-        return _get_image_index(), IMAGE_TEXT_DIM
-    if modality == "extracted_image":  # NEW
-        return _get_extracted_image_index(), IMAGE_TEXT_DIM
-    if modality == "video_frame":
-        return _get_video_frame_index(), VIDEO_FRAME_DIM
-    if modality == "video_transcript":
-        return _get_video_transcript_index(), VIDEO_TRANSCRIPT_DIM
-    raise ValueError(f"Unknown modality: {modality}")
-
-def build_vector_item(*, vector_id: str, values: List[float], metadata: Dict[str, Any]) -> Dict[str, Any]:
-    md = dict(metadata or {})
-    md.setdefault("server_upserted_at", datetime.utcnow().isoformat() + "Z")
+    try:
+        name, dim = _MODALITY_INDEXES[modality]
+    except KeyError:
+        raise ValueError(f"Unknown modality: {modality}")
+    return _index_by_name(name), dim
+
+def upserted_at_timestamp() -> str:
+    """UTC timestamp in the server_upserted_at format; compute once per batch."""
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+def _sparse_index_for_modality(modality: Modality):
+    """Return the sparse mirror index for a modality, or None if it has none."""
+    if modality == "text" and TEXT_SPARSE_INDEX_NAME:
+        return _index_by_name(TEXT_SPARSE_INDEX_NAME)
+    return None
+
+def _sparse_embed(texts: List[str], input_type: Literal["passage", "query"]) -> List[Dict[str, Any]]:
+    """Encode texts with Pinecone's hosted sparse model into {indices, values} dicts."""
+    sparse_vectors: List[Dict[str, Any]] = []
+    for batch in _chunked(texts, SPARSE_EMBED_BATCH):
+        embeddings = pc.inference.embed(
+            model=SPARSE_EMBED_MODEL,
+            inputs=batch,
+            parameters={"input_type": input_type, "truncate": "END"},
+        )
+        sparse_vectors.extend(
+            {"indices": e["sparse_indices"], "values": e["sparse_values"]} for e in embeddings
+        )
+    return sparse_vectors
+
+def _upsert_sparse_mirror(sparse_index, vectors: List[Dict[str, Any]], namespace: Optional[str]) -> None:
+    """Upsert the text of dense vector items into the sparse index under the same IDs."""
+    items = [v for v in vectors if (v.get("metadata") or {}).get("text")]
+    if not items:
+        return
+    sparse_values = _sparse_embed([v["metadata"]["text"] for v in items], "passage")
+    sparse_items = [
+        {"id": v["id"], "sparse_values": sv, "metadata": v["metadata"]}
+        for v, sv in zip(items, sparse_values)
+    ]
+    for batch in _chunked(sparse_items, MAX_BATCH):
+        sparse_index.upsert(vectors=batch, namespace=namespace)
+
+def build_vector_item(
+    *,
+    vector_id: str,
+    values: List[float],
+    metadata: Dict[str, Any],
+    timestamp: Optional[str] = None,
+    copy_metadata: bool = True,
+) -> Dict[str, Any]:
+    """
+    Build a Pinecone vector dict, stamping server_upserted_at.
+
+    Pass a shared `timestamp` when building many items in a loop, and
+    copy_metadata=False when the caller owns a freshly built metadata dict
+    that may be stamped in place.
+    """
+    md = dict(metadata or {}) if copy_metadata or metadata is None else metadata
+    md.setdefault("server_upserted_at", timestamp or upserted_at_timestamp())
     return {"id": vector_id, "values": values, "metadata": md}
 
+def make_vector_builder(
+    base_metadata: Dict[str, Any],
+    *,
+    timestamp: Optional[str] = None,
+) -> Callable[[str, List[float], Dict[str, Any]], Dict[str, Any]]:
+    """
+    Return a builder for a batch of vectors that share most of their metadata.
+
+    base_metadata is cleaned (None values dropped) and stamped with
+    server_upserted_at once; the returned build(vector_id, values, metadata)
+    only merges in the per-item fields, which must not contain None.
+    """
+    base = {k: v for k, v in base_metadata.items() if v is not None}
+    base.setdefault("server_upserted_at", timestamp or upserted_at_timestamp())
+
+    def build(vector_id: str, values: List[float], metadata: Dict[str, Any]) -> Dict[str, Any]:
+        return {"id": vector_id, "values": values, "metadata": base | metadata}
+
+    return build
+
 def _guard_dims(values: List[float], expected_dim: int, *, vector_id: Optional[str] = None, modality: Optional[str] = None):
     if len(values) != expected_dim:
         tag = f" (id={vector_id})" if vector_id else ""
         mod = f" for modality={modality}" if modality else ""
         raise ValueError(f"Embedding dim mismatch{mod}{tag}: got {len(values)}, expected {expected_dim}.")
 
+def _checked_dims(vectors: Iterable[Dict[str, Any]], expected_dim: int, modality: str) -> Iterator[Dict[str, Any]]:
+    for v in vectors:
+        if len(v["values"]) != expected_dim:
+            _guard_dims(v["values"], expected_dim, vector_id=v.get("id"), modality=modality)
+        yield v
+
+def _upsert_batch(index, sparse_index, batch: List[Dict[str, Any]], namespace: Optional[str]) -> None:
+    index.upsert(vectors=batch, namespace=namespace)
+    if sparse_index is not None:
+        _upsert_sparse_mirror(sparse_index, batch, namespace)
+
 # -------------------- Public API --------------------
 def upsert_vectors(
     *,
-    vectors: List[Dict[str, Any]],
+    vectors: Iterable[Dict[str, Any]],
     modality: Modality,
     namespace: Optional[str] = None,
-) -> None:
+    batch_size: Optional[int] = None,
+) -> int:
     """
     Upsert to the correct index based on modality.
     Each vector dict must have keys: id, values, metadata (optional).
+    Batches hold at most batch_size items (default MAX_BATCH) and are split
+    further so no request exceeds Pinecone's 2MB limit.
+
+    `vectors` may be a lazy iterator: each batch is sent as soon as it fills,
+    with at most POOL_THREADS batches in flight. Returns the number upserted.
     """
-    if not vectors:
-        return
+    if isinstance(vectors, list) and not vectors:
+        return 0
 
     index, expected_dim = _index_for_modality(modality)
-
-    # Dimension guard per item
-    for v in vectors:
-        _guard_dims(v["values"], expected_dim, vector_id=v.get("id"), modality=modality)
-
-    bsz = max(1, min(MAX_BATCH, len(vectors)))
-    for batch in _chunked(vectors, bsz):
-        index.upsert(vectors=batch, namespace=namespace)
+    sparse_index = _sparse_index_for_modality(modality)
+
+    if isinstance(vectors, list):
+        # Dimension guard up front for lists, so a bad item fails before any request
+        bad = next((v for v in vectors if len(v["values"]) != expected_dim), None)
+        if bad is not None:
+            _guard_dims(bad["values"], expected_dim, vector_id=bad.get("id"), modality=modality)
+
+    count = 0
+    pending = set()
+    for batch in _upsert_batches(_checked_dims(vectors, expected_dim, modality), max(1, batch_size or MAX_BATCH)):
+        if len(pending) >= POOL_THREADS:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()  # Stop producing once a batch has failed
+        # Batches are independent; send them while the next one is assembled
+        pending.add(_pinecone_pool.submit(_upsert_batch, index, sparse_index, batch, namespace))
+        count += len(batch)
+
+    wait(pending, return_when=ALL_COMPLETED)
+    for future in pending:
+        future.result()  # Re-raise the first failed batch
+    return count
 
 def delete_vectors_by_ids(
     *,
@@ -142,7 +324,25 @@ def delete_vectors_by_ids(
     if not ids:
         return
     index, _ = _index_for_modality(modality)
-    index.delete(ids=ids, namespace=namespace)
+    sparse_index = _sparse_index_for_modality(modality)
+    # Pinecone accepts at most 1000 ids per delete request
+    for batch in _chunked(ids, 1000):
+        index.delete(ids=batch, namespace=namespace)
+        if sparse_index is not None:
+            sparse_index.delete(ids=batch, namespace=namespace)
+
+def delete_vectors_by_filter(
+    *,
+    metadata_filter: Dict[str, Any],
+    modality: Modality,
+    namespace: Optional[str] = None,
+) -> None:
+    """Delete every vector in a modality's index that matches a metadata filter."""
+    index, _ = _index_for_modality(modality)
+    index.delete(filter=metadata_filter, namespace=namespace)
+    sparse_index = _sparse_index_for_modality(modality)
+    if sparse_index is not None:
+        sparse_index.delete(filter=metadata_filter, namespace=namespace)
 
 def query_vectors(
     *,
@@ -182,19 +382,56 @@ def update_vectors_metadata(
     """
     Update or delete metadata on existing vectors WITHOUT re-upserting values.
 
-    Pinecone v5 has per-id update. We loop IDs to apply:
+    Pinecone v5 has per-id update. Each ID gets a single request applying:
       - set_metadata: dict of keys to set/overwrite
       - delete_keys: list of keys to remove
+    The per-ID requests are independent, so they run concurrently on the
+    shared Pinecone thread pool (the index client is thread-safe).
     """
-    if not vector_ids:
+    if not vector_ids or not (set_metadata or delete_keys):
         return
     index, _ = _index_for_modality(modality)
-    ns = namespace
-    for vid in vector_ids:
-        if set_metadata:
-            index.update(id=vid, set_metadata=set_metadata, namespace=ns)
-        if delete_keys:
-            index.update(id=vid, delete_metadata=delete_keys, namespace=ns)
+
+    update_kwargs: Dict[str, Any] = {"namespace": namespace}
+    if set_metadata:
+        update_kwargs["set_metadata"] = set_metadata
+    if delete_keys:
+        update_kwargs["delete_metadata"] = delete_keys
+
+    indexes = [index]
+    sparse_index = _sparse_index_for_modality(modality)
+    if sparse_index is not None:
+        indexes.append(sparse_index)
+
+    futures = [
+        _pinecone_pool.submit(idx.update, id=vid, **update_kwargs)
+        for idx in indexes
+        for vid in vector_ids
+    ]
+    wait(futures, return_when=ALL_COMPLETED)
+
+    errors = [f.exception() for f in futures if f.exception() is not None]
+    if errors:
+        raise RuntimeError(
+            f"Failed to update metadata on {len(errors)}/{len(futures)} vectors: {errors[0]}"
+        ) from errors[0]
+
+def _keyword_hits(text_lower: str, term_weights: Dict[str, int]) -> Optional[int]:
+    """
+    Total occurrences of the keyword terms in text_lower, or None if any term is missing.
+
+    Each distinct term is counted on its own, so terms that overlap in the
+    text ("the" and "hen" in "then") are all found; a term repeated in the
+    query counts once per repetition.
+    """
+    hits = 0
+    for term, weight in term_weights.items():
+        count = text_lower.count(term)
+        if not count:
+            return None
+        hits += count * weight
+    return hits
+
 
 def keyword_search_text(
     *,
@@ -204,10 +441,15 @@ def keyword_search_text(
     metadata_filter: Optional[Dict[str, Any]] = None,
 ):
     """
-    Perform keyword search on text chunks using Pinecone's fetch_by_metadata API.
+    Perform keyword search on text chunks.
 
-    Uses Pinecone's early-access fetch_by_metadata endpoint to retrieve vectors
-    by metadata filters only, then filters by exact keyword matches.
+    When PINECONE_TEXT_SPARSE_INDEX_NAME is configured, the keywords are
+    encoded with the sparse model and scored server-side against the sparse
+    mirror of the text index, so only top_k rows come back.
+
+    Otherwise falls back to Pinecone's early-access fetch_by_metadata
+    endpoint to retrieve vectors by metadata filters only, then filters by
+    exact keyword matches client-side.
 
     Args:
         keywords: Search keywords (will be matched case-insensitive in text field)
@@ -218,24 +460,30 @@ def keyword_search_text(
     Returns:
         Query result object with matches containing keyword-matched chunks
     """
-    import requests
-    import logging
-    logger = logging.getLogger(__name__)
+    sparse_index = _sparse_index_for_modality("text")
+    if sparse_index is not None:
+        sparse_vector = _sparse_embed([keywords], "query")[0]
+        result = sparse_index.query(
+            sparse_vector=sparse_vector,
+            top_k=top_k,
+            namespace=namespace,
+            filter=metadata_filter,
+            include_metadata=True,
+        )
+        return {
+            "matches": [
+                {"id": m.id, "score": m.score, "metadata": m.metadata or {}}
+                for m in result.matches
+            ]
+        }
 
-    # Get index host using describe_index
-    index_info = pc.describe_index(TEXT_INDEX_NAME)
-    index_host = index_info.host  # e.g., "myindex-abc123.svc.us-east1-gcp.pinecone.io"
+    # Index host, e.g. "myindex-abc123.svc.us-east1-gcp.pinecone.io" (cached after first lookup)
+    index_host = _host_for(TEXT_INDEX_NAME)
 
     # Build fetch_by_metadata request
     # Fetch more than needed since we'll filter by keywords
     fetch_limit = min(top_k * 100, 10000)
 
-    headers = {
-        "Api-Key": _PINECONE_KEY,
-        "Content-Type": "application/json",
-        "X-Pinecone-API-Version": "2024-07"  # Required for pinecone-client>=5.x
-    }
-
     body = {
         "limit": fetch_limit
     }
@@ -253,38 +501,42 @@ def keyword_search_text(
     else:
         body["filter"] = base_filter
 
-    logger.info(f"[Keyword Search] Fetching from Pinecone using fetch_by_metadata API (host={index_host}, filter={body['filter']})")
+    logger.info("[Keyword Search] Fetching from Pinecone using fetch_by_metadata API (host=%s, filter=%s)", index_host, body["filter"])
 
     # Make direct API call to fetch_by_metadata
     try:
-        response = requests.post(
+        response = _get_http_session().post(
             f"https://{index_host}/vectors/fetch_by_metadata",
-            headers=headers,
-            json=body,
+            headers=_REST_HEADERS,
+            data=_json.dumps(body),
             timeout=30
         )
         response.raise_for_status()
-        data = response.json()
+        data = _json.loads(response.content)
     except requests.exceptions.HTTPError as e:
-        logger.error(f"[Keyword Search] HTTP error: {e.response.status_code} - {e.response.text}")
+        logger.error("[Keyword Search] HTTP error: %s - %s", e.response.status_code, e.response.text)
         raise
     except Exception as e:
-        logger.error(f"[Keyword Search] Request failed: {e}")
+        logger.error("[Keyword Search] Request failed: %s", e)
         raise
 
     # Extract vectors from response
     # Response format is a dict of vectors: {"vectors": {"id1": {...}, "id2": {...}}}
-    vector_dict = data.get("vectors", {})
-    vectors = list(vector_dict.values()) if vector_dict else []
+    vector_dict = data.get("vectors") or {}
+    del data
 
-    logger.info(f"[Keyword Search] Received {len(vectors)} vectors from fetch_by_metadata")
+    logger.info("[Keyword Search] Received %d vectors from fetch_by_metadata", len(vector_dict))
 
     # Filter results by keyword matches in the 'text' field
     keywords_lower = keywords.lower().strip()
     keyword_terms = keywords_lower.split()
+    term_weights = Counter(keyword_terms)
 
-    matched_results = []
-    for vector in vectors:
+    # Min-heap of the best top_k matches so far, keyed (score, -position) so
+    # ties keep fetch order like the previous stable sort did
+    top_matches: List[tuple] = []
+    match_count = 0
+    for position, vector in enumerate(vector_dict.values()):
         metadata = vector.get("metadata", {})
         text_content = metadata.get("text", "")
 
@@ -294,32 +546,38 @@ def keyword_search_text(
         text_lower = text_content.lower()
 
         # Check if ALL keywords appear in the text (AND logic)
-        if all(term in text_lower for term in keyword_terms):
-            # Calculate relevance score based on keyword frequency
-            score = sum(text_lower.count(term) for term in keyword_terms)
-            # Normalize by text length to avoid bias toward longer texts
-            score = score / max(len(text_content.split()), 1)
-
-            # Create match object in same format as query results
-            match = {
-                "id": vector.get("id", ""),
-                "score": score,
-                "metadata": metadata
-            }
-
-            matched_results.append(match)
-
-    logger.info(f"[Keyword Search] Found {len(matched_results)} keyword matches")
-
-    # Sort by relevance score (descending)
-    matched_results.sort(key=lambda x: x.get("score", 0), reverse=True)
-
-    # Limit to top_k results
-    matched_results = matched_results[:top_k]
-
-    logger.info(f"[Keyword Search] Returning {len(matched_results)} results")
+        hits = _keyword_hits(text_lower, term_weights)
+        if hits is not None:
+            # Relevance is keyword frequency, normalized by text length to
+            # avoid bias toward longer texts
+            score = hits / max(len(text_content.split()), 1)
+
+            match_count += 1
+            key = (score, -position)
+            if len(top_matches) < top_k:
+                heapq.heappush(top_matches, (key, vector))
+            elif top_matches and key > top_matches[0][0]:
+                heapq.heapreplace(top_matches, (key, vector))
+
+    logger.info("[Keyword Search] Found %d keyword matches", match_count)
+
+    # Create match objects in same format as query results, best first
+    matched_results = [
+        {
+            "id": vector.get("id", ""),
+            "score": key[0],
+            "metadata": vector.get("metadata", {}),
+        }
+        for key, vector in sorted(top_matches, key=lambda item: item[0], reverse=True)
+    ]
+
+    logger.info("[Keyword Search] Returning %d results", len(matched_results))
     if matched_results:
-        logger.info(f"[Keyword Search] Sample result: id={matched_results[0].get('id')[:50]}, score={matched_results[0].get('score')}, has_metadata={bool(matched_results[0].get('metadata'))}")
+        top = matched_results[0]
+        logger.info(
+            "[Keyword Search] Sample result: id=%s, score=%s, has_metadata=%s",
+            top.get("id")[:50], top.get("score"), bool(top.get("metadata")),
+        )
 
     # Return in a format similar to query_vectors (which is JSON-serializable)
     return {"matches": matched_results}
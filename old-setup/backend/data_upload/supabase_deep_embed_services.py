@@ -1,18 +1,29 @@
 # data_upload/supabase_deep_embed_services.py
 
 import os
+import time
 import logging
-from typing import List, Dict, Any, Optional
-from uuid import uuid4
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Union
+from datetime import datetime, timezone
+import numpy as np
 from supabase import Client
 
-from data_upload.pinecone_services import build_vector_item, upsert_vectors
-from utils.db_helpers import ensure_doc_meta, register_vectors
+from data_upload.pinecone_services import (
+    PINECONE_IMAGE_BATCH,
+    make_vector_builder,
+    upsert_vectors,
+)
+from utils.db_helpers import append_chunks_and_vectors, ensure_doc_meta, new_chunk_id
+
+if TYPE_CHECKING:
+    from ingestion.text.extract_text import ExtractedImage
 
 logger = logging.getLogger(__name__)
 
 EXTRACTED_IMAGES_BUCKET = os.getenv("EXTRACTED_IMAGES_BUCKET", "extracted-images")
+IMG_UPLOAD_CONCURRENCY = int(os.getenv("IMG_UPLOAD_CONCURRENCY", "12"))
+IMG_UPLOAD_ATTEMPTS = 3
 
 
 def upload_extracted_image_to_bucket(
@@ -29,21 +40,16 @@ def upload_extracted_image_to_bucket(
     filename = f"{page_str}_img_{image_index}.{format}"
     storage_path = f"{user_id}/{doc_id}/{filename}"
     
+    # Single request that overwrites on re-ingest, instead of upload then update.
+    # The cached client keeps its storage connections alive across images.
     try:
         supabase.storage.from_(EXTRACTED_IMAGES_BUCKET).upload(
             path=storage_path,
             file=image_bytes,
-            file_options={"content-type": f"image/{format}"}
+            file_options={"content-type": f"image/{format}", "upsert": "true"}
         )
     except Exception as e:
-        try:
-            supabase.storage.from_(EXTRACTED_IMAGES_BUCKET).update(
-                path=storage_path,
-                file=image_bytes,
-                file_options={"content-type": f"image/{format}"}
-            )
-        except Exception as update_error:
-            raise RuntimeError(f"Failed to upload image: {e}, update failed: {update_error}")
+        raise RuntimeError(f"Failed to upload image: {e}")
 
     # No longer generate public_url - buckets are private
     # Frontend should use /storage/signed-url endpoint with bucket + storage_path
@@ -53,6 +59,27 @@ def upload_extracted_image_to_bucket(
     }
 
 
+def _upload_with_retry(supabase: Client, user_id: str, doc_id: str, img: "ExtractedImage") -> Dict[str, str]:
+    """Upload one extracted image, backing off on transient storage errors (e.g. 429s)."""
+    for attempt in range(IMG_UPLOAD_ATTEMPTS):
+        try:
+            return upload_extracted_image_to_bucket(
+                supabase=supabase,
+                image_bytes=img.image_bytes,
+                user_id=user_id,
+                doc_id=doc_id,
+                page_number=img.page_number,
+                image_index=img.image_index,
+                format=img.format,
+            )
+        except Exception as e:
+            if attempt == IMG_UPLOAD_ATTEMPTS - 1:
+                raise
+            delay = 0.5 * 2 ** attempt
+            logger.warning(f"Extracted image upload failed (attempt {attempt + 1}), retrying in {delay}s: {e}")
+            time.sleep(delay)
+
+
 
 
 def ingest_deep_embed_images(
@@ -63,8 +90,8 @@ def ingest_deep_embed_images(
     parent_filename: str,
     parent_storage_path: str,
     parent_bucket: Optional[str] = None,
-    images_data: List[Dict[str, Any]],
-    embed_image_vectors: List[List[float]],
+    images_data: List["ExtractedImage"],
+    embed_image_vectors: Union[List[List[float]], np.ndarray],
     embedding_model: str = "clip-ViT-B-32",
     embedding_dim: int = 512,
     namespace: Optional[str] = None,
@@ -92,118 +119,100 @@ def ingest_deep_embed_images(
 
     ensure_doc_meta(supabase, user_id=user_id, doc_id=doc_id, group_id=group_id)
     
-    # Find the max chunk_index for this doc to continue numbering
-    existing_chunks = supabase.table("app_chunks").select("chunk_index").eq(
-        "doc_id", doc_id
-    ).order("chunk_index", desc=True).limit(1).execute()
-    
-    max_chunk_index = 0
-    if existing_chunks.data and len(existing_chunks.data) > 0:
-        max_chunk_index = existing_chunks.data[0]["chunk_index"]
-    
-    logger.debug(f"Starting image chunk_index at {max_chunk_index + 1} (max existing: {max_chunk_index})")
-    
+    # Ensure parent_bucket is always provided with sensible default
+    # Infer bucket from parent_storage_path if not provided
+    effective_parent_bucket = parent_bucket
+    if not effective_parent_bucket and parent_storage_path:
+        if parent_storage_path.startswith('google-drive/'):
+            effective_parent_bucket = 'google-drive'
+        elif parent_storage_path.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')):
+            effective_parent_bucket = 'images'
+        else:
+            effective_parent_bucket = 'texts'
+        logger.debug(f"Inferred parent_bucket: {effective_parent_bucket} from path: {parent_storage_path}")
+
+    # Upload to Supabase storage concurrently; map() keeps results in image order
+    # so the assigned chunk_index follows image order
+    workers = max(1, min(IMG_UPLOAD_CONCURRENCY, len(images_data)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        upload_results = list(pool.map(
+            lambda img: _upload_with_retry(supabase, user_id, doc_id, img),
+            images_data,
+        ))
+
     chunk_rows = []
-    vectors = []
     registry = []
-    
-    for idx, (img_data, emb) in enumerate(zip(images_data, embed_image_vectors)):
-        # Upload to Supabase storage
-        upload_result = upload_extracted_image_to_bucket(
-            supabase=supabase,
-            image_bytes=img_data["image_bytes"],
-            user_id=user_id,
-            doc_id=doc_id,
-            page_number=img_data.get("page_number"),
-            image_index=img_data["image_index"],
-            format=img_data.get("format", "png"),
-        )
-        
-        # Create chunk row with CONTINUING chunk_index
-        chunk_id = str(uuid4())
-        chunk_index = max_chunk_index + idx + 1
-        
+    for img, upload_result in zip(images_data, upload_results):
+        chunk_id = new_chunk_id()
         chunk_rows.append({
             "chunk_id": chunk_id,
             "doc_id": doc_id,
-            "chunk_index": chunk_index,
             "modality": "image",
             "storage_path": upload_result["storage_path"],
             "bucket": upload_result["bucket"],
-            "mime_type": f"image/{img_data.get('format', 'png')}",
+            "mime_type": f"image/{img.format}",
             "user_id": user_id,
         })
-        
-        # Build Pinecone metadata
-        vector_id = f"{chunk_id}:{embedding_version}"
-
-        # Ensure parent_bucket is always provided with sensible default
-        # Infer bucket from parent_storage_path if not provided
-        effective_parent_bucket = parent_bucket
-        if not effective_parent_bucket and parent_storage_path:
-            if parent_storage_path.startswith('google-drive/'):
-                effective_parent_bucket = 'google-drive'
-            elif parent_storage_path.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')):
-                effective_parent_bucket = 'images'
-            else:
-                effective_parent_bucket = 'texts'
-            logger.debug(f"Inferred parent_bucket: {effective_parent_bucket} from path: {parent_storage_path}")
-
-        metadata = {
-            "user_id": user_id,
-            "doc_id": doc_id,
-            "chunk_id": chunk_id,
-            "chunk_index": chunk_index,
-            "modality": "image",
-            "source": "extracted",
-            "bucket": upload_result["bucket"],
-            "storage_path": upload_result["storage_path"],
-            # No public_url - frontend should use /storage/signed-url endpoint
-            "mime_type": f"image/{img_data.get('format', 'png')}",
-            "embedding_model": embedding_model,
-            "embedding_version": embedding_version,
-            "parent_filename": parent_filename,
-            "parent_storage_path": parent_storage_path,
-            "parent_bucket": effective_parent_bucket,  # Always provide a value
-            "dimensions": f"{img_data['width']}x{img_data['height']}",
-            "upload_date": datetime.utcnow().date().isoformat(),
-        }
-        
-        if img_data.get("page_number") is not None:
-            metadata["page_number"] = img_data["page_number"]
-        if img_data.get("image_index") is not None:
-            metadata["image_index"] = img_data["image_index"]
-        if group_id:
-            metadata["group_id"] = group_id
-        
-        metadata = {k: v for k, v in metadata.items() if v is not None}
-        
-        vectors.append(build_vector_item(
-            vector_id=vector_id,
-            values=emb,
-            metadata=metadata
-        ))
-        
         registry.append({
-            "vector_id": vector_id,
+            "vector_id": f"{chunk_id}:{embedding_version}",
             "chunk_id": chunk_id,
             "embedding_model": embedding_model,
             "embedding_version": embedding_version,
         })
-    
-    # Insert into Supabase
-    if chunk_rows:
-        supabase.table("app_chunks").insert(chunk_rows).execute()
 
-    if registry:
-        register_vectors(supabase, registry)
+    # Insert chunks (CONTINUING the doc's chunk_index server-side) and their
+    # registry rows into Supabase in one round-trip
+    chunk_indexes = append_chunks_and_vectors(supabase, doc_id, chunk_rows, registry)
+
+    # Fields shared by every image are cleaned and stamped once; the per-image
+    # dicts never contain None
+    build = make_vector_builder({
+        "user_id": user_id,
+        "doc_id": doc_id,
+        "modality": "image",
+        "source": "extracted",
+        "embedding_model": embedding_model,
+        "embedding_version": embedding_version,
+        "parent_filename": parent_filename,
+        "parent_storage_path": parent_storage_path,
+        "parent_bucket": effective_parent_bucket,  # Always provide a value
+        "upload_date": datetime.now(timezone.utc).date().isoformat(),
+        "group_id": group_id or None,
+    })
+
+    # One float32 (n, 512) block; rows go to Pinecone as-is and are converted
+    # by the client when the request is encoded
+    embs = np.asarray(embed_image_vectors, dtype=np.float32)
+
+    vectors = []
+    for img, emb, chunk_row, reg in zip(images_data, embs, chunk_rows, registry):
+        chunk_id = chunk_row["chunk_id"]
+
+        # Build Pinecone metadata
+        extra = {
+            "chunk_id": chunk_id,
+            "bucket": chunk_row["bucket"],
+            "storage_path": chunk_row["storage_path"],
+            # No public_url - frontend should use /storage/signed-url endpoint
+            "mime_type": chunk_row["mime_type"],
+            "dimensions": f"{img.width}x{img.height}",
+            "image_index": img.image_index,
+        }
+        chunk_index = chunk_indexes.get(chunk_id)
+        if chunk_index is not None:
+            extra["chunk_index"] = chunk_index
+        if img.page_number is not None:
+            extra["page_number"] = img.page_number
+
+        vectors.append(build(reg["vector_id"], emb, extra))
     
     # Upsert to Pinecone EXTRACTED IMAGES index
     if vectors:
         upsert_vectors(
             vectors=vectors,
             modality="extracted_image",
-            namespace=namespace or user_id
+            namespace=namespace or user_id,
+            batch_size=PINECONE_IMAGE_BATCH,
         )
     
     return {
@@ -2,20 +2,28 @@ import os
 import logging
 from typing import Optional, List, Dict, Any
 from uuid import uuid4
-from datetime import datetime
-from io import BytesIO
+from datetime import datetime, timezone
 
 from supabase import Client
-from PIL import Image
 
-from data_upload.pinecone_services import build_vector_item, upsert_vectors
-from utils.db_helpers import ensure_doc_meta, register_vectors, sha256_hash
+from data_upload.pinecone_services import build_vector_item, delete_vectors_by_ids, upsert_vectors
+from utils.db_helpers import ensure_doc_meta, insert_chunks_alongside, new_chunk_id, sha256_hash
 
 logger = logging.getLogger(__name__)
 
 IMAGE_BUCKET = os.getenv("IMAGE_BUCKET", "images")
 
 
+def _looks_like_image(file_content: bytes) -> bool:
+    """Check the file signature for PNG, JPEG or WebP."""
+    sig = file_content[:12]
+    return (
+        sig.startswith(b"\x89PNG\r\n\x1a\n")
+        or sig.startswith(b"\xff\xd8\xff")
+        or (sig[:4] == b"RIFF" and sig[8:12] == b"WEBP")
+    )
+
+
 def upload_image_to_bucket(supabase: Client, file_content: bytes, filename: str, bucket: str = IMAGE_BUCKET) -> Optional[str]:
     logger.debug(f"upload_image_to_bucket called: filename={filename}, size={len(file_content)} bytes, bucket={bucket}")
 
@@ -26,16 +34,9 @@ def upload_image_to_bucket(supabase: Client, file_content: bytes, filename: str,
         logger.warning(f"Unsupported image extension: {ext}")
         return None
 
-    try:
-        logger.debug("Opening image with PIL...")
-        img = Image.open(BytesIO(file_content))
-        logger.debug(f"Image opened successfully: format={img.format}, size={img.size}")
-
-        logger.debug("Verifying image...")
-        img.verify()
-        logger.debug("Image verification passed")
-    except Exception as e:
-        logger.error(f"Image validation failed: {e}", exc_info=True)
+    # Reject non-images by their magic bytes; no need to parse the whole file
+    if not _looks_like_image(file_content):
+        logger.error(f"Image validation failed: {filename} is not a PNG, JPEG or WebP file")
         return None
 
     file_path = f"uploads/{uuid4()}_{filename}"
@@ -82,8 +83,7 @@ def wipe_images_from_bucket(supabase: Client, bucket: str = IMAGE_BUCKET) -> str
     return supabase.storage.empty_bucket(bucket)
 
 
-def _insert_single_image_chunk(
-    supabase: Client,
+def _build_single_image_chunk(
     *,
     user_id: str,
     doc_id: str,
@@ -93,7 +93,7 @@ def _insert_single_image_chunk(
     size_bytes: int | None = None,
 ) -> Dict[str, Any]:
     row = {
-        "chunk_id": str(uuid4()),
+        "chunk_id": new_chunk_id(),
         "doc_id": doc_id,
         "chunk_index": 1,
         "modality": "image",
@@ -103,10 +103,7 @@ def _insert_single_image_chunk(
         "user_id": user_id,
         "size_bytes": int(size_bytes) if size_bytes is not None else None,
     }
-    data = supabase.table("app_chunks").insert(row).execute()
-    if not data.data:
-        raise RuntimeError("Insert into app_chunks returned no rows")
-    return data.data[0]
+    return row
 
 
 def ingest_single_image(
@@ -133,10 +130,8 @@ def ingest_single_image(
         raise ValueError(f"Embedding dim mismatch for image: got {embedding_dim}, expected 512.")
 
     doc_id = doc_id or str(uuid4())
-    ensure_doc_meta(supabase, user_id=user_id, doc_id=doc_id, group_id=group_id)
 
-    chunk_row = _insert_single_image_chunk(
-        supabase,
+    chunk_row = _build_single_image_chunk(
         user_id=user_id,
         doc_id=doc_id,
         storage_path=storage_path,
@@ -160,20 +155,31 @@ def ingest_single_image(
         "embedding_version": embedding_version,
         "content_sha256": sha256_hash(file_bytes),
         "title": filename,
-        "upload_date": datetime.utcnow().date().isoformat(),
+        "upload_date": datetime.now(timezone.utc).date().isoformat(),
     }
     if group_id:
         metadata["group_id"] = group_id
 
     vector_item = build_vector_item(vector_id=vector_id, values=emb, metadata=metadata)
-    upsert_vectors(vectors=[vector_item], modality="image", namespace=namespace or str(user_id))
+    ns = namespace or str(user_id)
 
-    register_vectors(supabase, [{
-        "vector_id": vector_id,
-        "chunk_id": chunk_row["chunk_id"],
-        "embedding_model": embedding_model,
-        "embedding_version": embedding_version,
-    }])
+    # Meta row, then chunk row and registry row together in one round-trip,
+    # overlapped with the Pinecone upsert
+    insert_chunks_alongside(
+        supabase,
+        [chunk_row],
+        [{
+            "vector_id": vector_id,
+            "chunk_id": chunk_row["chunk_id"],
+            "embedding_model": embedding_model,
+            "embedding_version": embedding_version,
+        }],
+        before_insert=lambda: ensure_doc_meta(
+            supabase, user_id=user_id, doc_id=doc_id, group_id=group_id,
+        ),
+        upsert=lambda: upsert_vectors(vectors=[vector_item], modality="image", namespace=ns),
+        rollback=lambda: delete_vectors_by_ids(ids=[vector_id], modality="image", namespace=ns),
+    )
 
     return {
         "doc_id": doc_id,
@@ -181,5 +187,5 @@ def ingest_single_image(
         "storage_path": chunk_row["storage_path"],
         "bucket": chunk_row["bucket"],
         "vector_count": 1,
-        "namespace": (namespace or str(user_id)),
+        "namespace": ns,
     }
\ No newline at end of file
@@ -1,12 +1,17 @@
 import os
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 from uuid import uuid4
-from datetime import datetime
+from datetime import datetime, timezone
 
 from supabase import Client
 
-from data_upload.pinecone_services import build_vector_item, upsert_vectors
-from utils.db_helpers import ensure_doc_meta, register_vectors, sha256_hash
+from data_upload.pinecone_services import (
+    PINECONE_TEXT_BATCH,
+    delete_vectors_by_ids,
+    make_vector_builder,
+    upsert_vectors,
+)
+from utils.db_helpers import ensure_doc_meta, insert_chunks_alongside, new_chunk_id, sha256_hashes
 
 TEXT_BUCKET = os.getenv("TEXT_BUCKET", "texts")
 
@@ -47,8 +52,7 @@ def wipe_text_from_bucket(supabase: Client, bucket: str = TEXT_BUCKET) -> str:
     return supabase.storage.empty_bucket(bucket)
 
 
-def _insert_chunk_rows(
-    supabase: Client,
+def _build_chunk_rows(
     *,
     user_id: str,
     doc_id: str,
@@ -58,21 +62,69 @@ def _insert_chunk_rows(
     text_chunks: List[str],
     size_bytes: int | None = None,
 ) -> List[Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
-    for idx, _ in enumerate(text_chunks, start=1):
-        rows.append({
-            "chunk_id": str(uuid4()),
-            "doc_id": doc_id,
-            "chunk_index": idx,
-            "modality": "text",
-            "storage_path": storage_path,
-            "bucket": bucket,
-            "mime_type": mime_type,
-            "user_id": user_id,
-            **({"size_bytes": int(size_bytes)} if (idx == 1 and size_bytes is not None) else {}),
-        })
-    data = supabase.table("app_chunks").insert(rows).execute()
-    return data.data or []
+    # Fields shared by every row are built once; only the id and index vary
+    template = {
+        "doc_id": doc_id,
+        "modality": "text",
+        "storage_path": storage_path,
+        "bucket": bucket,
+        "mime_type": mime_type,
+        "user_id": user_id,
+    }
+    rows: List[Dict[str, Any]] = [
+        {"chunk_id": new_chunk_id(), "chunk_index": idx, **template}
+        for idx in range(1, len(text_chunks) + 1)
+    ]
+    if rows and size_bytes is not None:
+        rows[0]["size_bytes"] = int(size_bytes)
+    return rows
+
+
+def _iter_vector_items(
+    *,
+    user_id: str,
+    filename: str,
+    chunk_rows: List[Dict[str, Any]],
+    registry: List[Dict[str, Any]],
+    text_chunks: List[str],
+    embed_text_vectors: List[List[float]],
+    content_hashes: List[str],
+    extra_vector_metadata: Optional[List[Dict[str, Any]]],
+    group_id: Optional[str],
+) -> Iterator[Dict[str, Any]]:
+    if not chunk_rows:
+        return
+    first = chunk_rows[0]
+    # Every chunk of the document shares these; they are cleaned and stamped once
+    build = make_vector_builder({
+        "user_id": user_id,
+        "doc_id": first["doc_id"],
+        "modality": "text",
+        "bucket": first["bucket"],
+        "storage_path": first["storage_path"],
+        "mime_type": first["mime_type"],
+        "embedding_model": registry[0]["embedding_model"],
+        "embedding_version": registry[0]["embedding_version"],
+        "title": filename,
+        "upload_date": datetime.now(timezone.utc).date().isoformat(),
+        "group_id": group_id or None,
+    })
+
+    for idx, (emb, ch, reg, text, content_hash) in enumerate(
+        zip(embed_text_vectors, chunk_rows, registry, text_chunks, content_hashes)
+    ):
+        metadata: Dict[str, Any] = {
+            "chunk_id": ch["chunk_id"],
+            "chunk_index": ch["chunk_index"],
+            "content_sha256": content_hash,
+            "text": text,
+        }
+
+        if extra_vector_metadata is not None and extra_vector_metadata[idx]:
+            # Extras are built without None values, so they merge as-is
+            metadata |= extra_vector_metadata[idx]
+
+        yield build(reg["vector_id"], emb, metadata)
 
 
 def ingest_text_chunks(
@@ -90,6 +142,7 @@ def ingest_text_chunks(
     doc_id: Optional[str] = None,
     embedding_version: int = 1,
     extra_vector_metadata: Optional[List[Dict[str, Any]]] = None,
+    content_hashes: Optional[List[str]] = None,
     size_bytes: int | None = None,
     group_id: Optional[str] = None,
 ) -> Dict[str, Any]:
@@ -99,16 +152,16 @@ def ingest_text_chunks(
     if extra_vector_metadata is not None and len(extra_vector_metadata) != len(text_chunks):
         raise ValueError("extra_vector_metadata length must match number of text chunks")
 
+    if content_hashes is not None and len(content_hashes) != len(text_chunks):
+        raise ValueError("content_hashes length must match number of text chunks")
+
     if embedding_dim and embedding_dim != 384:
         raise ValueError(f"Embedding dim mismatch for text: got {embedding_dim}, expected 384.")
 
     doc_id = doc_id or str(uuid4())
 
-    # ensure meta row (stores group_id)
-    ensure_doc_meta(supabase, user_id=user_id, doc_id=doc_id, group_id=group_id)
-
-    chunk_rows = _insert_chunk_rows(
-        supabase,
+    # Rows are inserted together with their registry entries below
+    chunk_rows = _build_chunk_rows(
         user_id=user_id,
         doc_id=doc_id,
         storage_path=storage_path,
@@ -118,57 +171,52 @@ def ingest_text_chunks(
         size_bytes=size_bytes,
     )
 
-    vectors: List[Dict[str, Any]] = []
-    registry: List[Dict[str, Any]] = []
-
-    for idx, (emb, ch, text) in enumerate(zip(embed_text_vectors, chunk_rows, text_chunks)):
-        vector_id = f"{ch['chunk_id']}:{embedding_version}"
-
-        metadata: Dict[str, Any] = {
-            "user_id": user_id,
-            "doc_id": ch["doc_id"],
+    registry: List[Dict[str, Any]] = [
+        {
+            "vector_id": f"{ch['chunk_id']}:{embedding_version}",
             "chunk_id": ch["chunk_id"],
-            "chunk_index": ch["chunk_index"],
-            "modality": "text",
-            "bucket": ch["bucket"],
-            "storage_path": ch["storage_path"],
-            "mime_type": ch["mime_type"],
             "embedding_model": embedding_model,
             "embedding_version": embedding_version,
-            "content_sha256": sha256_hash(text),
-            "title": filename,
-            "text": text,
-            "upload_date": datetime.utcnow().date().isoformat(),
         }
-
-        if group_id:
-            metadata["group_id"] = group_id
-
-        if extra_vector_metadata is not None:
-            extra = extra_vector_metadata[idx] or {}
-            if isinstance(extra.get("page_number"), int):
-                metadata["page_number"] = extra["page_number"]
-            for k, v in extra.items():
-                if k == "page_number":
-                    continue
-                if v is not None:
-                    metadata[k] = v
-
-        metadata = {k: v for k, v in metadata.items() if v is not None}
-
-        vectors.append(build_vector_item(vector_id=vector_id, values=emb, metadata=metadata))
-        registry.append({
-            "vector_id": vector_id,
-            "chunk_id": ch["chunk_id"],
-            "embedding_model": embedding_model,
-            "embedding_version": embedding_version,
-        })
-
-    upsert_vectors(vectors=vectors, modality="text", namespace=namespace or str(user_id))
-    register_vectors(supabase, registry)
+        for ch in chunk_rows
+    ]
+    ns = namespace or str(user_id)
+
+    # The meta row (stores group_id) + chunk/registry insert and the Pinecone
+    # upsert are independent, so they run concurrently. Vector items are built
+    # lazily so each batch is sent while the next one is being formatted, and
+    # only in-flight batches are held in memory
+    vector_count = insert_chunks_alongside(
+        supabase,
+        chunk_rows,
+        registry,
+        before_insert=lambda: ensure_doc_meta(
+            supabase, user_id=user_id, doc_id=doc_id, group_id=group_id,
+        ),
+        upsert=lambda: upsert_vectors(
+            vectors=_iter_vector_items(
+                user_id=user_id,
+                filename=filename,
+                chunk_rows=chunk_rows,
+                registry=registry,
+                text_chunks=text_chunks,
+                embed_text_vectors=embed_text_vectors,
+                # Callers that already hashed the chunks (e.g. for dedup) pass the digests
+                content_hashes=content_hashes or sha256_hashes(text_chunks),
+                extra_vector_metadata=extra_vector_metadata,
+                group_id=group_id,
+            ),
+            modality="text",
+            namespace=ns,
+            batch_size=PINECONE_TEXT_BATCH,
+        ),
+        rollback=lambda: delete_vectors_by_ids(
+            ids=[r["vector_id"] for r in registry], modality="text", namespace=ns,
+        ),
+    )
 
     return {
         "doc_id": doc_id,
-        "vector_count": len(vectors),
-        "namespace": (namespace or str(user_id)),
+        "vector_count": vector_count,
+        "namespace": ns,
     }
@@ -0,0 +1,51 @@
+# embed/_models.py
+import os
+import threading
+from typing import Optional
+from sentence_transformers import SentenceTransformer
+
+CLIP_MODEL_NAME = "clip-ViT-B-32"
+TEXT_MODEL_NAME = "all-MiniLM-L12-v2"
+
+# encode() already sorts inputs by length before batching (and restores the
+# order), so a larger batch only groups similar-length texts together
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# Opt-in reduced precision for inference: FP16 on CUDA (text model only, see
+# get_clip_model), dynamic INT8 Linear layers on CPU. Embeddings shift slightly,
+# so enable it before ingesting into a fresh index rather than mixing with
+# vectors written at full precision.
+EMBED_REDUCED_PRECISION = os.getenv("EMBED_REDUCED_PRECISION", "0") == "1"
+
+def reduced_precision(model: SentenceTransformer, allow_half: bool = True) -> Optional[str]:
+    """Name of the variant optimize_for_inference applies to model ("fp16"/"int8"), or None."""
+    if not EMBED_REDUCED_PRECISION:
+        return None
+    if model.device.type == "cuda":
+        return "fp16" if allow_half else None
+    return "int8"
+
+def optimize_for_inference(model: SentenceTransformer, allow_half: bool = True) -> SentenceTransformer:
+    precision = reduced_precision(model, allow_half)
+    if precision is None:
+        return model
+    import torch
+    model.eval()
+    if precision == "fp16":
+        return model.half()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+# One CLIP instance per process, shared by the image, CLIP-text and label
+# embedders (they all need the same 512-D space)
+_clip_model = None
+_clip_lock = threading.Lock()
+
+def get_clip_model() -> SentenceTransformer:
+    global _clip_model
+    if _clip_model is None:
+        with _clip_lock:
+            if _clip_model is None:
+                # The CLIP processor hands float32 pixel_values to the vision
+                # tower, so it can't be halved; INT8 on CPU keeps float inputs
+                _clip_model = optimize_for_inference(SentenceTransformer(CLIP_MODEL_NAME), allow_half=False)
+    return _clip_model
@@ -0,0 +1,79 @@
+# embed/embedding_cache.py
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Opt-in on-disk cache of text embeddings keyed by (model, content sha256), so
+# re-uploads and reindexes skip the encoder for chunks it has already seen.
+# Leave unset to disable.
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "")
+
+_SQLITE_MAX_VARS = 900  # stay under SQLite's bound-parameter limit per query
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+def enabled() -> bool:
+    return bool(EMBED_CACHE_PATH)
+
+def _connection() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(EMBED_CACHE_PATH, check_same_thread=False)
+        # WAL lets the API process and Celery workers share one file
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, content_sha256 TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, content_sha256)) WITHOUT ROWID"
+        )
+        _conn = conn
+    return _conn
+
+def get_many(model: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+    """Return cached vectors for the given content hashes; misses are omitted."""
+    found: Dict[str, List[float]] = {}
+    unique = list(dict.fromkeys(hashes))
+    try:
+        with _lock:
+            conn = _connection()
+            for i in range(0, len(unique), _SQLITE_MAX_VARS):
+                part = unique[i:i + _SQLITE_MAX_VARS]
+                rows = conn.execute(
+                    "SELECT content_sha256, vector FROM embeddings "
+                    f"WHERE model = ? AND content_sha256 IN ({','.join('?' * len(part))})",
+                    (model, *part),
+                ).fetchall()
+                for content_hash, blob in rows:
+                    found[content_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+    except sqlite3.Error as e:
+        # A broken cache must never fail ingestion; fall back to embedding
+        logger.warning(f"Embedding cache read failed: {e}")
+        return {}
+    return found
+
+def put_many(model: str, hashes: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+    """Store vectors under their content hashes (float32 blobs)."""
+    if not hashes:
+        return
+    rows = [
+        (model, content_hash, np.asarray(vec, dtype=np.float32).tobytes())
+        for content_hash, vec in zip(hashes, vectors)
+    ]
+    try:
+        with _lock:
+            conn = _connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, content_sha256, vector) VALUES (?, ?, ?)",
+                    rows,
+                )
+    except sqlite3.Error as e:
+        logger.warning(f"Embedding cache write failed: {e}")
@@ -1,16 +1,38 @@
 # embed/embeddings.py
-from typing import List, Union
-from embed.text_embedder import embed as embed_text
+import asyncio
+from typing import List, Optional, Sequence, Union
+import numpy as np
+from PIL import Image
+from embed.text_embedder import CACHE_MODEL_NAME, embed as embed_text
 from embed.image_embedder import embed as embed_image
 from embed.clip_text_embedder import embed as embed_clip_text
+from embed import embedding_cache
 
-async def embed_texts(texts: List[str]) -> List[List[float]]:
-    return embed_text(texts)
+# The encoders block (and torch releases the GIL while they run), so each call
+# runs on a worker thread; the event loop stays free and concurrent calls overlap
 
-async def embed_images(images: List[bytes]) -> List[List[float]]:
-    return embed_image(images)
+async def embed_texts(texts: List[str], content_hashes: Optional[Sequence[str]] = None) -> List[List[float]]:
+    return await asyncio.to_thread(_embed_texts, texts, content_hashes)
+
+def _embed_texts(texts: List[str], content_hashes: Optional[Sequence[str]]) -> List[List[float]]:
+    # With the embedding cache enabled, callers that pass the sha256 of each
+    # text only pay for the encoder on texts it has not seen before
+    if content_hashes is None or not embedding_cache.enabled():
+        return embed_text(texts)
+
+    cached = embedding_cache.get_many(CACHE_MODEL_NAME, content_hashes)
+    misses = [i for i, h in enumerate(content_hashes) if h not in cached]
+    if misses:
+        miss_hashes = [content_hashes[i] for i in misses]
+        miss_vecs = embed_text([texts[i] for i in misses])
+        embedding_cache.put_many(CACHE_MODEL_NAME, miss_hashes, miss_vecs)
+        cached.update(zip(miss_hashes, miss_vecs))
+    return [cached[h] for h in content_hashes]
+
+async def embed_images(images: List[Union[bytes, Image.Image]], as_list: bool = True) -> Union[List[List[float]], np.ndarray]:
+    return await asyncio.to_thread(embed_image, images, as_list=as_list)
 
 async def embed_clip_texts(texts: List[str]) -> List[List[float]]:
     # CLIP text (512-D) — used for text->image search against the image index
-    return embed_clip_text(texts)
+    return await asyncio.to_thread(embed_clip_text, texts)
 
@@ -1,19 +1,22 @@
 # embed/image.py
-from typing import List
+from typing import List, Union
 from PIL import Image
 import io
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from embed._models import get_clip_model
 
-# e.g. use a CLIP-like model from SentenceTransformers
-_model = SentenceTransformer("clip-ViT-B-32")
+# CLIP model shared with the CLIP-text and label embedders
+_model = get_clip_model()
 
-def embed(images: List[bytes]) -> List[List[float]]:
+def embed(images: List[Union[bytes, Image.Image]], as_list: bool = True) -> Union[List[List[float]], np.ndarray]:
     """
-    :param images: list of raw image bytes (e.g. PNG/JPEG)
+    :param images: list of raw image bytes (e.g. PNG/JPEG) or already-decoded
+                   PIL images, which are used as-is instead of decoded again
+    :param as_list: return Python lists; pass False to keep the model's
+                    float32 (n, dim) array
     :return: list of embeddings
     """
-    pil_images = [Image.open(io.BytesIO(b)) for b in images]
+    pil_images = [b if isinstance(b, Image.Image) else Image.open(io.BytesIO(b)) for b in images]
     # model.encode accepts PIL images for CLIP
     embeddings = _model.encode(pil_images, show_progress_bar=False)
-    return embeddings.tolist()
+    return embeddings.tolist() if as_list else np.asarray(embeddings, dtype=np.float32)
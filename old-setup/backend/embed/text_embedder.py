@@ -1,8 +1,14 @@
 # embed/text.py
 from typing import List
 from sentence_transformers import SentenceTransformer
+from embed._models import EMBED_BATCH_SIZE, TEXT_MODEL_NAME, optimize_for_inference, reduced_precision
 
-_model = SentenceTransformer("all-MiniLM-L12-v2")
+_model = SentenceTransformer(TEXT_MODEL_NAME)
+# Vectors differ between the FP16, INT8 and full-precision models, so the
+# embedding cache keeps each variant's entries apart
+_precision = reduced_precision(_model)
+CACHE_MODEL_NAME = f"{TEXT_MODEL_NAME}:{_precision}" if _precision else TEXT_MODEL_NAME
+_model = optimize_for_inference(_model)
 
 def embed(texts: List[str]) -> List[List[float]]:
-    return _model.encode(texts, show_progress_bar=False).tolist()
+    return _model.encode(texts, batch_size=EMBED_BATCH_SIZE, show_progress_bar=False).tolist()
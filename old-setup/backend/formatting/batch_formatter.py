@@ -4,6 +4,7 @@ Handles formatting of document chunks with Pinecone metadata updates.
 Uses the formatting microservice for actual formatting operations.
 """
 
+import asyncio
 import logging
 import os
 from datetime import datetime, timezone
@@ -13,10 +14,13 @@ from uuid import UUID
 from pinecone import Pinecone
 from supabase import Client
 
+from data_upload.pinecone_services import update_vectors_metadata
 from formatting.formatting_client import FormattingServiceClient, get_formatting_client
 
 logger = logging.getLogger(__name__)
 
+FETCH_BATCH_SIZE = 100  # Vector ids per Pinecone fetch request
+
 
 class BatchChunkFormatter:
     """Formats document chunks in batches and updates Pinecone metadata."""
@@ -45,6 +49,10 @@ class BatchChunkFormatter:
             raise RuntimeError("PINECONE_TEXT_INDEX_NAME environment variable not set")
         self.text_index = self.pc.Index(text_index_name)
 
+        # (chunk_ids, vector_id_map) from the last Pinecone fetch, reused by the
+        # metadata update that follows it for the same chunks
+        self._last_fetch_cache: Optional[tuple[frozenset, dict]] = None
+
         logger.info("Initialized BatchChunkFormatter with microservice client")
 
     async def format_document_chunks(
@@ -84,29 +92,38 @@ class BatchChunkFormatter:
         }
 
         try:
-            # 1. Get all text chunks for this document from database
-            chunks_response = self.supabase.table("app_chunks").select(
-                "chunk_id, chunk_index, modality, formatting_status"
-            ).eq("doc_id", doc_id).eq("user_id", user_id).eq(
-                "modality", "text"
-            ).order("chunk_index").limit(max_chunks).execute()
-
-            if not chunks_response.data:
-                logger.warning(f"No text chunks found for doc_id={doc_id}")
-                return results
-
-            chunks = chunks_response.data
-            results["total_chunks"] = len(chunks)
+            # 1. Get the text chunks still needing formatting, and count the
+            # already formatted ones for "skipped", in two concurrent queries
+            def _select_unformatted():
+                return self.supabase.table("app_chunks").select(
+                    "chunk_id, chunk_index, modality, formatting_status"
+                ).eq("doc_id", doc_id).eq("user_id", user_id).eq(
+                    "modality", "text"
+                ).or_(
+                    "formatting_status.is.null,formatting_status.neq.formatted"
+                ).order("chunk_index").limit(max_chunks).execute()
+
+            def _count_formatted():
+                return self.supabase.table("app_chunks").select(
+                    "chunk_id", count="exact", head=True
+                ).eq("doc_id", doc_id).eq("user_id", user_id).eq(
+                    "modality", "text"
+                ).eq("formatting_status", "formatted").execute()
+
+            chunks_response, formatted_response = await asyncio.gather(
+                asyncio.to_thread(_select_unformatted),
+                asyncio.to_thread(_count_formatted),
+            )
 
-            logger.info(f"Found {len(chunks)} text chunks to process")
+            unformatted_chunks = chunks_response.data or []
+            results["skipped"] = formatted_response.count or 0
+            results["total_chunks"] = len(unformatted_chunks) + results["skipped"]
 
-            # 2. Filter out already formatted chunks
-            unformatted_chunks = [
-                c for c in chunks
-                if c.get("formatting_status") != "formatted"
-            ]
+            if not results["total_chunks"]:
+                logger.warning(f"No text chunks found for doc_id={doc_id}")
+                return results
 
-            results["skipped"] = len(chunks) - len(unformatted_chunks)
+            logger.info(f"Found {results['total_chunks']} text chunks to process")
 
             if not unformatted_chunks:
                 logger.info("All chunks already formatted")
@@ -114,31 +131,31 @@ class BatchChunkFormatter:
 
             logger.info(f"Processing {len(unformatted_chunks)} unformatted chunks")
 
-            # 3. Fetch chunk text from Pinecone
+            # 2. Fetch chunk text from Pinecone
             # Note: Pinecone vector IDs are stored as {chunk_id}:{embedding_version}
             # We need to construct the full vector IDs
             chunk_id_map = {c["chunk_id"]: c for c in unformatted_chunks}
-            pinecone_data = self._fetch_chunks_from_pinecone(chunk_id_map, user_id)
+            pinecone_data = await self._fetch_chunks_from_pinecone(chunk_id_map, user_id)
 
             if not pinecone_data:
                 results["errors"].append("Failed to fetch chunks from Pinecone")
                 return results
 
-            # 4. Mark chunks as "formatting" in database
+            # 3. Mark chunks as "formatting" in database
             self._update_chunk_status(list(pinecone_data.keys()), "formatting")
 
-            # 5. Format chunks via microservice with concurrent processing
+            # 4. Format chunks via microservice with concurrent processing
             # Default to FORMATTING_MAX_CONCURRENT env var, or 10 as fallback
             max_concurrent = int(os.getenv("FORMATTING_MAX_CONCURRENT", "10"))
             formatted_results = await self._format_chunks_with_microservice(pinecone_data, max_concurrent=max_concurrent)
 
-            # 6. Batch update Pinecone metadata with formatted text
+            # 5. Batch update Pinecone metadata with formatted text
             if formatted_results["formatted"]:
                 try:
                     formatted_chunk_ids = [cid for cid, _ in formatted_results["formatted"]]
                     formatted_texts = {cid: txt for cid, txt in formatted_results["formatted"]}
 
-                    self._batch_update_pinecone_metadata(formatted_chunk_ids, user_id, formatted_texts)
+                    await self._batch_update_pinecone_metadata(formatted_chunk_ids, user_id, formatted_texts)
                     self._batch_mark_chunks_formatted(formatted_chunk_ids)
 
                     results["formatted"] = len(formatted_chunk_ids)
@@ -156,7 +173,7 @@ class BatchChunkFormatter:
                             results["failed"] += 1
                             results["errors"].append(f"Chunk {chunk_id}: {str(e)}")
 
-            # 7. Batch mark failed chunks
+            # 6. Batch mark failed chunks
             if formatted_results["failed"]:
                 failed_chunk_data = {cid: err for cid, err in formatted_results["failed"]}
                 self._batch_mark_chunks_failed(failed_chunk_data)
@@ -176,13 +193,34 @@ class BatchChunkFormatter:
             results["errors"].append(f"Batch error: {str(e)}")
             return results
 
-    def _get_value(self, obj, key: str, default=None):
-        """Get value from dict or object attribute."""
-        if isinstance(obj, dict):
-            return obj.get(key, default)
-        return getattr(obj, key, default)
-
-    def _fetch_chunks_from_pinecone(
+    async def _fetch_vector_metadata(self, vector_ids: list[str], user_id: str) -> dict[str, dict]:
+        """
+        Fetch vectors in batches of FETCH_BATCH_SIZE, running the batches
+        concurrently. Returns the merged dict of vector_id -> metadata.
+        """
+        batches = [
+            vector_ids[i:i + FETCH_BATCH_SIZE]
+            for i in range(0, len(vector_ids), FETCH_BATCH_SIZE)
+        ]
+        responses = await asyncio.gather(*[
+            asyncio.to_thread(self.text_index.fetch, ids=batch, namespace=user_id)
+            for batch in batches
+        ])
+
+        # The SDK returns FetchResponse/Vector objects; plain dicts are only
+        # handled so the method also works with dict-shaped responses. The
+        # shape is checked once per response, not per field access
+        metadata_by_id = {}
+        for response in responses:
+            if isinstance(response, dict):
+                vectors = response.get("vectors") or {}
+                metadata_by_id.update((vid, v.get("metadata") or {}) for vid, v in vectors.items())
+            else:
+                vectors = response.vectors or {}
+                metadata_by_id.update((vid, v.metadata or {}) for vid, v in vectors.items())
+        return metadata_by_id
+
+    async def _fetch_chunks_from_pinecone(
         self,
         chunk_id_map: dict[str, dict],
         user_id: str
@@ -202,27 +240,21 @@ class BatchChunkFormatter:
 
             # Fetch from Pinecone
             vector_id_map = {v["chunk_id"]: v["vector_id"] for v in vectors_response.data}
-            fetch_response = self.text_index.fetch(
-                ids=list(vector_id_map.values()),
-                namespace=user_id
-            )
-
-            vectors_dict = self._get_value(fetch_response, 'vectors', {})
-            if not vectors_dict:
+            metadata_by_id = await self._fetch_vector_metadata(list(vector_id_map.values()), user_id)
+            if not metadata_by_id:
                 return {}
+            self._last_fetch_cache = (frozenset(vector_id_map), vector_id_map)
 
             # Extract texts
             reverse_map = {v: k for k, v in vector_id_map.items()}
             chunk_data = {}
 
-            for vector_id, vector_obj in vectors_dict.items():
+            for vector_id, metadata in metadata_by_id.items():
                 chunk_id = reverse_map.get(vector_id)
                 if not chunk_id:
                     continue
 
-                metadata = self._get_value(vector_obj, 'metadata', {})
-                text = self._get_value(metadata, 'text', '')
-
+                text = metadata.get("text")
                 if text:
                     chunk_data[chunk_id] = text
 
@@ -253,7 +285,7 @@ class BatchChunkFormatter:
 
         return result
 
-    def _batch_update_pinecone_metadata(
+    async def _batch_update_pinecone_metadata(
         self,
         chunk_ids: list[str],
         user_id: str,
@@ -261,62 +293,55 @@ class BatchChunkFormatter:
     ):
         """Batch update Pinecone vector metadata with formatted text."""
         try:
-            # Get vector_ids from registry
-            vectors_response = self.supabase.table("app_vector_registry").select(
-                "chunk_id, vector_id"
-            ).in_("chunk_id", chunk_ids).execute()
-
-            if not vectors_response.data:
-                raise ValueError("No vector_ids found for chunks")
-
-            vector_id_map = {v["chunk_id"]: v["vector_id"] for v in vectors_response.data}
+            cached = self._last_fetch_cache
+            if cached is not None and cached[0].issuperset(chunk_ids):
+                # These chunks were just fetched; skip the registry select
+                vector_id_map = cached[1]
+            else:
+                # Get vector_ids from registry
+                vectors_response = self.supabase.table("app_vector_registry").select(
+                    "chunk_id, vector_id"
+                ).in_("chunk_id", chunk_ids).execute()
 
-            # Fetch all vectors at once
-            vector_ids = list(vector_id_map.values())
-            fetch_response = self.text_index.fetch(ids=vector_ids, namespace=user_id)
-            vectors_dict = self._get_value(fetch_response, 'vectors', {})
+                if not vectors_response.data:
+                    raise ValueError("No vector_ids found for chunks")
 
-            if not vectors_dict:
-                raise ValueError("No vectors found in Pinecone")
+                vector_id_map = {v["chunk_id"]: v["vector_id"] for v in vectors_response.data}
 
-            # Prepare batch update
             formatted_at = datetime.now(timezone.utc).isoformat()
-            vectors_to_upsert = []
-
+            updates = []
             for chunk_id in chunk_ids:
                 vector_id = vector_id_map.get(chunk_id)
                 if not vector_id:
                     logger.warning(f"No vector_id found for chunk {chunk_id}")
                     continue
-
-                vector_obj = vectors_dict.get(vector_id)
-                if not vector_obj:
-                    logger.warning(f"Vector not found for vector_id {vector_id}")
-                    continue
-
-                current_metadata = self._get_value(vector_obj, "metadata", {})
-                values = self._get_value(vector_obj, "values", [])
-
-                updated_metadata = {
-                    **current_metadata,
+                updates.append((vector_id, {
                     "formatted_text": formatted_texts[chunk_id],
                     "formatted_at": formatted_at
-                }
-
-                vectors_to_upsert.append({
-                    "id": vector_id,
-                    "values": values,
-                    "metadata": updated_metadata
-                })
-
-            # Batch upsert to Pinecone (up to 1000 vectors per request)
-            batch_size = 1000
-            for i in range(0, len(vectors_to_upsert), batch_size):
-                batch = vectors_to_upsert[i:i + batch_size]
-                self.text_index.upsert(vectors=batch, namespace=user_id)
-                logger.debug(f"Updated batch of {len(batch)} vectors in Pinecone")
-
-            logger.info(f"Batch updated {len(vectors_to_upsert)} vectors in Pinecone")
+                }))
+
+            # Partial metadata updates: Pinecone merges the keys server-side, so
+            # the vectors never have to be fetched and re-uploaded. Going through
+            # update_vectors_metadata also updates the sparse mirror, which
+            # keyword search reads formatted_text from
+            results = await asyncio.gather(*[
+                asyncio.to_thread(
+                    update_vectors_metadata,
+                    vector_ids=[vector_id],
+                    modality="text",
+                    namespace=user_id,
+                    set_metadata=metadata
+                )
+                for vector_id, metadata in updates
+            ], return_exceptions=True)
+
+            errors = [r for r in results if isinstance(r, Exception)]
+            if errors:
+                raise RuntimeError(
+                    f"Failed to update {len(errors)}/{len(updates)} vectors: {errors[0]}"
+                ) from errors[0]
+
+            logger.info(f"Batch updated {len(updates)} vectors in Pinecone")
 
         except Exception as e:
             logger.error(f"Failed to batch update Pinecone metadata: {e}", exc_info=True)
@@ -335,28 +360,16 @@ class BatchChunkFormatter:
 
             vector_id = vector_response.data[0]["vector_id"]
 
-            # Fetch current vector
-            fetch_response = self.text_index.fetch(ids=[vector_id], namespace=user_id)
-            vectors_dict = self._get_value(fetch_response, 'vectors', {})
-            vector_obj = vectors_dict.get(vector_id)
-
-            if not vector_obj:
-                raise ValueError(f"Vector not found for vector_id {vector_id}")
-
-            # Update metadata
-            current_metadata = self._get_value(vector_obj, "metadata", {})
-            values = self._get_value(vector_obj, "values", [])
-
-            updated_metadata = {
-                **current_metadata,
-                "formatted_text": formatted_text,
-                "formatted_at": datetime.now(timezone.utc).isoformat()
-            }
-
-            # Upsert with updated metadata
-            self.text_index.upsert(
-                vectors=[{"id": vector_id, "values": values, "metadata": updated_metadata}],
-                namespace=user_id
+            # Partial metadata update (dense index and sparse mirror); no fetch
+            # and re-upsert of the vector
+            update_vectors_metadata(
+                vector_ids=[vector_id],
+                modality="text",
+                namespace=user_id,
+                set_metadata={
+                    "formatted_text": formatted_text,
+                    "formatted_at": datetime.now(timezone.utc).isoformat()
+                }
             )
 
             logger.debug(f"Updated metadata for chunk {chunk_id}")
@@ -399,13 +412,20 @@ class BatchChunkFormatter:
             failed_chunks: Dict mapping chunk_id to error message
         """
         try:
-            # PostgreSQL/Supabase doesn't support different values per row in a simple update,
-            # so we need to do individual updates for failed chunks (they have different errors)
-            for chunk_id, error in failed_chunks.items():
-                self._mark_chunk_failed(chunk_id, error)
+            # Each chunk has its own error, so a plain update can't do it; the
+            # mark_chunks_failed RPC applies all of them in one UPDATE ... FROM
+            self.supabase.rpc("mark_chunks_failed", {
+                "payload": [
+                    {"chunk_id": chunk_id, "err": error[:500]}
+                    for chunk_id, error in failed_chunks.items()
+                ]
+            }).execute()
             logger.debug(f"Marked {len(failed_chunks)} chunks as failed")
         except Exception as e:
             logger.error(f"Failed to batch mark chunks as failed: {e}", exc_info=True)
+            # Fall back to individual updates
+            for chunk_id, error in failed_chunks.items():
+                self._mark_chunk_failed(chunk_id, error)
 
     def _mark_chunk_formatted(self, chunk_id: str):
         """Mark chunk as successfully formatted."""
@@ -2,17 +2,19 @@ import os
 import logging
 from uuid import uuid4
 from tempfile import NamedTemporaryFile
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 import asyncio
+import numpy as np
 
 from core.config import get_settings
 from core.deps import get_supabase
 from data_upload.supabase_text_services import ingest_text_chunks
 from data_upload.supabase_image_services import ingest_single_image
 from data_upload.supabase_deep_embed_services import ingest_deep_embed_images
-from ingestion.text.extract_text import extract_text_metadata, extract_text_and_images_metadata
+from ingestion.text.extract_text import ExtractedImage, extract_text_metadata, extract_text_and_images_metadata
 from embed.embeddings import embed_texts, embed_images
 from tagging.background_tasks import tag_uploaded_image_after_ingest, tag_document_after_ingest
+from utils.db_helpers import sha256_hashes
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -25,6 +27,46 @@ SUPPORTED_TEXT = ("docx", "pdf", "txt", "md", "ppt", "pptx")
 SUPPORTED_IMAGES = ("png", "jpeg", "jpg", "webp")
 
 
+async def _embed_in_parallel(embed_batch: Callable[[slice], Awaitable[Any]], count: int) -> List[Any]:
+    """
+    Embed `count` inputs in mini-batches of EMBED_PARALLEL_BATCH_SIZE, with at
+    most EMBED_MAX_CONCURRENCY batches in flight; embed_batch(s) embeds the
+    inputs in slice s.
+
+    Returns the per-batch results in input order.
+    """
+    settings = get_settings()
+    batch_size = max(1, settings.EMBED_PARALLEL_BATCH_SIZE)
+    semaphore = asyncio.Semaphore(max(1, settings.EMBED_MAX_CONCURRENCY))
+
+    async def _run(start: int):
+        async with semaphore:
+            return await embed_batch(slice(start, start + batch_size))
+
+    return await asyncio.gather(*[_run(start) for start in range(0, count, batch_size)])
+
+
+def _drop_duplicate_chunks(chunks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Keep only the first of any byte-identical text chunks (e.g. a header or
+    footer repeated on every page); the text stays searchable through it.
+
+    Returns the kept chunks and their SHA-256 hex digests, which double as
+    the vectors' content_sha256.
+    """
+    seen = set()
+    unique = []
+    hashes = []
+    digests = sha256_hashes([c.get("chunk_text") or "" for c in chunks])
+    for c, digest in zip(chunks, digests):
+        if digest in seen:
+            continue
+        seen.add(digest)
+        unique.append(c)
+        hashes.append(digest)
+    return unique, hashes
+
+
 async def ingest_file_content(
     file_content: bytes,
     filename: str,
@@ -256,7 +298,7 @@ async def ingest_file_content(
             meta_out["images"] = []
 
         chunks: List[Dict[str, Any]] = meta_out.get("text_chunks", [])
-        images_data: List[Dict[str, Any]] = meta_out.get("images", [])
+        images_data: List[ExtractedImage] = meta_out.get("images", [])
 
         logger.info(f"Extraction complete: {len(chunks)} text chunks, {len(images_data)} images")
 
@@ -269,25 +311,43 @@ async def ingest_file_content(
     
     if not chunks:
         raise ValueError("No text chunks were extracted from file")
+
+    # Don't embed, store or upsert repeated boilerplate more than once
+    unique_chunks, chunk_hashes = _drop_duplicate_chunks(chunks)
+    if len(unique_chunks) < len(chunks):
+        logger.info(f"Skipping {len(chunks) - len(unique_chunks)} duplicate text chunks")
+        chunks = unique_chunks
     
     # --- Embed and ingest text chunks ---
     logger.debug("Embedding text chunks")
     texts = [c["chunk_text"] for c in chunks]
-    text_vectors = await embed_texts(texts)
+    text_batches = await _embed_in_parallel(
+        lambda s: embed_texts(texts[s], content_hashes=chunk_hashes[s]), len(texts)
+    )
+    text_vectors = [vec for batch in text_batches for vec in batch]
     logger.info(f"Embedded {len(text_vectors)} text chunks")
     logger.debug(f"Text embedding model: {settings.EMBED_MODEL}")
     logger.debug(f"Text embedding dim: {settings.EMBED_DIM}")
     if text_vectors:
         logger.debug(f"Actual first vector shape: {len(text_vectors[0])}")
     
-    extra_metas = [{
-        "page_number": c.get("page_number"),
-        "char_start": c.get("char_start"),
-        "char_end": c.get("char_end"),
-        "preview": (c.get("chunk_text") or "")[:180].replace("\n", " "),
-        "converted_pdf_path": pdf_storage_path,  # Add converted PDF path for PowerPoint files
-        "original_filename": original_pptx_filename,  # Add original filename
-    } for c in chunks]
+    # Pinecone rejects null metadata, so only set the fields that have values
+    doc_extras = {
+        k: v for k, v in (
+            ("converted_pdf_path", pdf_storage_path),  # Converted PDF path for PowerPoint files
+            ("original_filename", original_pptx_filename),
+        ) if v is not None
+    }
+    extra_metas = []
+    for c in chunks:
+        extra = {
+            **doc_extras,
+            "preview": (c.get("chunk_text") or "")[:180].replace("\n", " "),
+        }
+        for key in ("page_number", "char_start", "char_end"):
+            if c.get(key) is not None:
+                extra[key] = c[key]
+        extra_metas.append(extra)
     
     logger.debug("Ingesting text chunks to Pinecone")
     try:
@@ -305,6 +365,7 @@ async def ingest_file_content(
             doc_id=doc_id,
             embedding_version=1,
             extra_vector_metadata=extra_metas,
+            content_hashes=chunk_hashes,
             size_bytes=len(file_content),
             group_id=group_id,
         )
@@ -336,8 +397,14 @@ async def ingest_file_content(
     if images_data:
         logger.debug(f"Starting image embedding for {len(images_data)} images")
         try:
-            image_bytes_list = [img["image_bytes"] for img in images_data]
-            image_vectors = await embed_images(image_bytes_list)
+            # The extractors already decoded each image (and took width/height
+            # from it); embed those PIL images rather than decoding the PNGs again
+            image_inputs = [img.pil_image if img.pil_image is not None else img.image_bytes for img in images_data]
+            # Keep the float32 array; the Pinecone client converts each row when sending
+            image_batches = await _embed_in_parallel(
+                lambda s: embed_images(image_inputs[s], as_list=False), len(image_inputs)
+            )
+            image_vectors = np.concatenate(image_batches)
             logger.info(f"Embedded {len(image_vectors)} extracted images")
 
             logger.debug("Ingesting deep embed images")
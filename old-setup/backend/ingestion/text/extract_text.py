@@ -3,10 +3,12 @@ from __future__ import annotations
 
 import os
 import logging
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 from PIL import Image
 import io
+import numpy as np
 import fitz  # PyMuPDF - add to requirements.txt
 from docx import Document  # python-docx - add to requirements.txt
 
@@ -23,6 +25,23 @@ logger = logging.getLogger(__name__)
 SUPPORTED_EXTS = {".pdf", ".docx", ".txt", ".md", ".ppt", ".pptx"}
 
 
+@dataclass(slots=True, frozen=True)
+class ExtractedImage:
+    """An image pulled out of a PDF/DOCX, already converted to RGB PNG."""
+    image_bytes: bytes
+    width: int
+    height: int
+    image_index: int
+    page_number: Optional[int]  # 1-based; None for DOCX
+    doc_name: str
+    user_id: str
+    timestamp: str
+    format: str = "png"
+    pil_image: Optional[Image.Image] = None  # Decoded image, reused for embedding
+    bbox: Any = None
+    dhash: Optional[int] = None
+
+
 def normalize_text(text: str) -> str:
     """
     Minimal text normalization - only fixes character encoding issues.
@@ -269,11 +288,52 @@ def is_important_image(
     return True
 
 
+NEAR_DUPLICATE_MAX_DISTANCE = 2  # Max differing dHash bits to treat two images as the same
+
+
+def image_dhash(image: Image.Image) -> int:
+    """64-bit difference hash: compares adjacent pixels of a 9x8 grayscale thumbnail."""
+    pixels = list(image.convert("L").resize((9, 8), Image.Resampling.BILINEAR).getdata())
+    bits = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+class _NearDuplicateFilter:
+    """
+    Tracks kept image hashes and detects near-duplicates by Hamming distance.
+
+    Hashes live in one uint64 array, so each check is a single vectorized
+    XOR + popcount over every kept hash.
+    """
+
+    def __init__(self, max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE):
+        self._max_distance = max_distance
+        self._hashes = np.empty(16, dtype=np.uint64)
+        self._count = 0
+
+    def seen(self, h: int) -> bool:
+        """Return True if h is near a kept hash; otherwise keep it and return False."""
+        h = np.uint64(h)
+        if self._count:
+            distances = np.bitwise_count(self._hashes[:self._count] ^ h)
+            if distances.min() <= self._max_distance:
+                return True
+        if self._count == len(self._hashes):
+            self._hashes = np.resize(self._hashes, 2 * len(self._hashes))
+        self._hashes[self._count] = h
+        self._count += 1
+        return False
+
+
 def extract_images_from_pdf(
     file_path: str,
     user_id: str,
     filter_important: bool = True,
-) -> List[Dict[str, Any]]:
+) -> List[ExtractedImage]:
     """Extract images from PDF using PyMuPDF."""
     logger.debug(f"Starting PDF image extraction from: {file_path}")
     logger.debug(f"Filter important: {filter_important}")
@@ -288,6 +348,7 @@ def extract_images_from_pdf(
     total_images_found = 0
     images_passed_filter = 0
     seen_xrefs = set()  # Track unique images by xref to avoid duplicates
+    near_duplicates = _NearDuplicateFilter()  # Same picture embedded under different xrefs
     duplicates_skipped = 0
 
     for page_num in range(len(doc)):
@@ -357,6 +418,13 @@ def extract_images_from_pdf(
 
                 # Mark this xref as seen
                 seen_xrefs.add(xref)
+
+                dhash = image_dhash(pil_image)
+                if near_duplicates.seen(dhash):
+                    logger.debug(f"  Skipping near-duplicate image {img_index} (xref={xref})")
+                    duplicates_skipped += 1
+                    continue
+
                 images_passed_filter += 1
 
                 # Convert PIL image back to bytes in PNG format for consistent storage
@@ -368,19 +436,20 @@ def extract_images_from_pdf(
                 img_rects = page.get_image_rects(xref)
                 bbox = img_rects[0] if img_rects else None
 
-                images.append({
-                    "image_bytes": converted_image_bytes,  # Use converted bytes
-                    "pil_image": pil_image,
-                    "page_number": page_num + 1,  # 1-based
-                    "image_index": img_index,
-                    "doc_name": doc_name,
-                    "user_id": user_id,
-                    "timestamp": ts,
-                    "width": pil_image.width,
-                    "height": pil_image.height,
-                    "format": "png",  # Always save as PNG after conversion
-                    "bbox": bbox,
-                })
+                images.append(ExtractedImage(
+                    image_bytes=converted_image_bytes,  # Use converted bytes
+                    pil_image=pil_image,
+                    page_number=page_num + 1,  # 1-based
+                    image_index=img_index,
+                    doc_name=doc_name,
+                    user_id=user_id,
+                    timestamp=ts,
+                    width=pil_image.width,
+                    height=pil_image.height,
+                    format="png",  # Always save as PNG after conversion
+                    bbox=bbox,
+                    dhash=dhash,
+                ))
 
                 logger.debug(f"  ✅ Kept image {img_index}: {pil_image.width}x{pil_image.height} (original mode: {original_mode})")
 
@@ -399,7 +468,7 @@ def extract_images_from_docx(
     file_path: str,
     user_id: str,
     filter_important: bool = True,
-) -> List[Dict[str, Any]]:
+) -> List[ExtractedImage]:
     """Extract images from DOCX."""
     logger.debug(f"Starting DOCX image extraction from: {file_path}")
     logger.debug(f"Filter important: {filter_important}")
@@ -412,6 +481,8 @@ def extract_images_from_docx(
     image_index = 0
     total_images_found = 0
     images_passed_filter = 0
+    duplicates_skipped = 0
+    near_duplicates = _NearDuplicateFilter()
     
     logger.debug(f"Scanning DOCX relationships for images...")
     
@@ -440,6 +511,13 @@ def extract_images_from_docx(
                     image_index += 1
                     continue
 
+                dhash = image_dhash(pil_image)
+                if near_duplicates.seen(dhash):
+                    logger.debug(f"  Skipping near-duplicate image {image_index}")
+                    duplicates_skipped += 1
+                    image_index += 1
+                    continue
+
                 images_passed_filter += 1
 
                 # Convert PIL image back to bytes in PNG format for consistent storage
@@ -447,19 +525,19 @@ def extract_images_from_docx(
                 pil_image.save(output_buffer, format='PNG')
                 converted_image_bytes = output_buffer.getvalue()
 
-                images.append({
-                    "image_bytes": converted_image_bytes,  # Use converted bytes
-                    "pil_image": pil_image,
-                    "page_number": None,  # DOCX doesn't have reliable pages
-                    "image_index": image_index,
-                    "doc_name": doc_name,
-                    "user_id": user_id,
-                    "timestamp": ts,
-                    "width": pil_image.width,
-                    "height": pil_image.height,
-                    "format": "png",  # Always save as PNG after conversion
-                    "bbox": None,
-                })
+                images.append(ExtractedImage(
+                    image_bytes=converted_image_bytes,  # Use converted bytes
+                    pil_image=pil_image,
+                    page_number=None,  # DOCX doesn't have reliable pages
+                    image_index=image_index,
+                    doc_name=doc_name,
+                    user_id=user_id,
+                    timestamp=ts,
+                    width=pil_image.width,
+                    height=pil_image.height,
+                    format="png",  # Always save as PNG after conversion
+                    dhash=dhash,
+                ))
 
                 logger.debug(f"  ✅ Kept image {image_index}: {pil_image.width}x{pil_image.height} (original mode: {original_mode})")
                 image_index += 1
@@ -468,7 +546,7 @@ def extract_images_from_docx(
                 logger.error(f"  ❌ Error extracting image {rel_id}: {e}")
                 continue
     
-    logger.info(f"DOCX extraction: {total_images_found} images found, {images_passed_filter} kept")
+    logger.info(f"DOCX extraction: {total_images_found} images found, {images_passed_filter} kept, {duplicates_skipped} duplicates")
     
     return images
 
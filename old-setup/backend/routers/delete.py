@@ -267,6 +267,15 @@ async def _delete_video(doc_id: str, user_id: str, supabase):
         elif modality == "video_transcript":
             deleted_transcripts += 1
 
+    # The uploaded video queued for the video worker is recorded on the doc
+    # itself (the worker removes it once processed, but not if it failed)
+    doc_meta = supabase.table("app_doc_meta").select("bucket, storage_path").eq(
+        "doc_id", doc_id
+    ).eq("user_id", user_id).execute()
+    for row in doc_meta.data or []:
+        if row.get("bucket") and row.get("storage_path"):
+            storage_files.add((row["bucket"], row["storage_path"]))
+
     # Delete video frame vectors from Pinecone using metadata filter
     try:
         frame_index = pc.Index(VIDEO_FRAME_INDEX_NAME)
@@ -10,9 +10,8 @@ from typing import Optional
 from datetime import datetime, timedelta, timezone
 import requests
 import os
-from supabase import create_client
 from core.security import get_current_user, AuthUser
-from core.config import get_settings
+from core.deps import get_supabase
 from core.token_encryption import encrypt_token, decrypt_token, is_token_encrypted
 
 router = APIRouter(tags=["onedrive"])
@@ -39,11 +38,9 @@ class OneDriveFilesResponse(BaseModel):
 # ============================================================================
 
 def get_supabase_client():
-    """Get Supabase client instance"""
-    return create_client(
-        get_settings().SUPABASE_URL,
-        get_settings().SUPABASE_KEY
-    )
+    """Get the shared Supabase client instance"""
+    # Reuse the cached client so requests share its connection pool
+    return get_supabase()
 
 
 def get_microsoft_credentials():
@@ -12,6 +12,7 @@ import stripe
 
 from core.deps import get_supabase
 from core.security import get_current_user, AuthUser
+from core.user_limits import invalidate_user_limits
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/stripe", tags=["stripe"])
@@ -307,6 +308,7 @@ async def handle_checkout_completed(session, supabase):
         "stripe_cancel_at_period_end": subscription.cancel_at_period_end,
         "max_files": PREMIUM_MAX_FILES,  # Upgrade to premium tier
     }).eq("user_id", user_id).execute()
+    invalidate_user_limits(user_id)
 
     logger.info(f"Activated premium subscription for user {user_id}")
 
@@ -336,6 +338,7 @@ async def handle_subscription_updated(subscription, supabase):
         update_data["max_files"] = 50  # Revert to free tier
 
     supabase.table("user_settings").update(update_data).eq("user_id", user_id).execute()
+    invalidate_user_limits(user_id)
 
 
 async def handle_subscription_deleted(subscription, supabase):
@@ -354,5 +357,6 @@ async def handle_subscription_deleted(subscription, supabase):
         "stripe_cancel_at_period_end": False,
         "max_files": 50,  # Free tier limit
     }).eq("user_id", user_id).execute()
+    invalidate_user_limits(user_id)
 
     logger.info(f"Downgraded user {user_id} to free tier")
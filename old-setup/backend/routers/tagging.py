@@ -2,6 +2,7 @@
 API endpoints for image and document auto-tagging functionality.
 """
 
+import heapq
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
@@ -252,9 +253,8 @@ async def search_images_by_tags(
             "avg_confidence": sum(t["confidence"] for t in tag_data["tags"]) / len(tag_data["tags"])
         })
 
-    # Sort by confidence and limit
-    results.sort(key=lambda x: x["avg_confidence"], reverse=True)
-    results = results[:request.limit]
+    # Top results by confidence (same order as a stable sort + slice)
+    results = heapq.nlargest(request.limit, results, key=lambda x: x["avg_confidence"])
 
     return SearchByTagsResponse(results=results, count=len(results))
 
@@ -566,11 +566,8 @@ async def search_documents_by_tags(
             "image_chunks": len([c for c in chunks if c["modality"] == "image"])
         })
 
-    # Sort by average confidence
-    results.sort(key=lambda x: x["avg_confidence"], reverse=True)
-
-    # Limit results
-    results = results[:request.limit]
+    # Top results by average confidence (same order as a stable sort + slice)
+    results = heapq.nlargest(request.limit, results, key=lambda x: x["avg_confidence"])
 
     return SearchByTagsResponse(results=results, count=len(results))
 
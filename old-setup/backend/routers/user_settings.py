@@ -14,6 +14,7 @@ from core.user_limits import (
     get_user_max_files,
     get_user_quota_status,
     ensure_user_settings_exist,
+    invalidate_user_limits,
     DEFAULT_MAX_FILES
 )
 
@@ -99,6 +100,7 @@ def update_user_max_files(
         response = supabase.table("user_settings").update({
             "max_files": request.max_files
         }).eq("user_id", user_id).execute()
+        invalidate_user_limits(user_id)
 
         if not response.data:
             raise HTTPException(
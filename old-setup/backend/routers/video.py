@@ -3,6 +3,7 @@ Video ingestion and query router.
 Proxies upload requests to the hypa-thymesia-video-query service.
 Handles video queries directly using local embedders and Pinecone.
 """
+import asyncio
 import logging
 import httpx
 import os
@@ -158,19 +159,49 @@ async def ingest_video(
     # Queue processing via Celery or BackgroundTasks
     task_id = None
     if USE_CELERY:
-        from celery_tasks import ingest_video as celery_ingest_video
-        task = celery_ingest_video.delay(
-            file_content=content,
-            filename=file.filename,
-            mime_type=file.content_type,
-            user_id=user_id,
-            doc_id=doc_id,
-            group_id=group_id,
+        from celery_app import celery_app
+
+        # Store the video first so only its path goes through the broker,
+        # not the video bytes themselves
+        # The worker removes it once processed; deleting the document also does
+        storage_path = f"{user_id}/{doc_id}_{file.filename}"
+        try:
+            # Synchronous client; keep the whole-video upload off the event loop
+            await asyncio.to_thread(
+                supabase.storage.from_("videos").upload,
+                storage_path,
+                content,
+                {"content-type": file.content_type or "video/mp4"},
+            )
+        except Exception as e:
+            logger.error(f"Error uploading video to storage: {e}", exc_info=True)
+            try:
+                supabase.table("app_doc_meta").update({
+                    "processing_status": "failed",
+                    "error_message": f"Failed to store video: {e}"[:500],
+                }).eq("doc_id", doc_id).execute()
+            except Exception as update_error:
+                logger.error(f"Failed to update error status: {update_error}")
+            raise HTTPException(500, detail="Failed to store video")
+
+        # Enqueue straight onto the video service's queue; going through
+        # ingest_video would only re-enqueue the same work one hop later
+        task = celery_app.send_task(
+            "celery_tasks.process_video",
+            kwargs={
+                "filename": file.filename,
+                "user_id": user_id,
+                "doc_id": doc_id,
+                "storage_path": storage_path,
+            },
+            queue="video_queue",
         )
         task_id = task.id
-        # Update doc_meta with Celery task ID
+        # Update doc_meta with Celery task ID and storage location
         supabase.table("app_doc_meta").update({
             "celery_task_id": task_id,
+            "storage_path": storage_path,
+            "bucket": "videos",
         }).eq("doc_id", doc_id).execute()
         logger.info(f"Queued Celery video processing: {file.filename} (doc_id={doc_id}, task_id={task_id})")
     elif background_tasks:
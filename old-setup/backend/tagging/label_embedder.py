@@ -8,10 +8,10 @@ import numpy as np
 from pathlib import Path
 from typing import List, Dict, Tuple
 from functools import lru_cache
-from sentence_transformers import SentenceTransformer
+from embed._models import get_clip_model
 
-# Use the same CLIP model as image embeddings for consistency
-_model = SentenceTransformer("clip-ViT-B-32")
+# Use the same CLIP model instance as image embeddings for consistency
+_model = get_clip_model()
 
 
 def load_object_labels() -> List[str]:
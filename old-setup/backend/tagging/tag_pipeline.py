@@ -5,6 +5,7 @@ Orchestrates the complete auto-tagging workflow.
 
 from typing import List, Dict, Optional
 import asyncio
+import heapq
 from concurrent.futures import ThreadPoolExecutor
 
 from tagging.label_embedder import get_top_label_candidates
@@ -280,8 +281,8 @@ async def get_popular_tags(
         tag = row["tag_name"]
         tag_counts[tag] = tag_counts.get(tag, 0) + 1
 
-    # Sort by count and return top N
-    sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+    # Top N by count without sorting every tag
+    sorted_tags = heapq.nlargest(limit, tag_counts.items(), key=lambda x: x[1])
 
     return [{"tag_name": tag, "count": count} for tag, count in sorted_tags]
 
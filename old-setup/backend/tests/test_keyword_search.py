@@ -0,0 +1,27 @@
+import os
+from collections import Counter
+
+# pinecone_services validates its config at import; no requests are made here
+os.environ.setdefault("PINECONE_API_KEY", "test-key")
+os.environ.setdefault("PINECONE_TEXT_INDEX_NAME", "test-text")
+os.environ.setdefault("PINECONE_IMAGE_INDEX_NAME", "test-image")
+os.environ.setdefault("PINECONE_EXTRACTED_IMAGE_INDEX_NAME", "test-extracted-image")
+
+from data_upload.pinecone_services import _keyword_hits
+
+
+def test_overlapping_terms_are_all_found():
+    # "the" and "hen" overlap in "then"; both must count
+    assert _keyword_hits("then", Counter(["the", "hen"])) == 2
+
+
+def test_missing_term_rejects_text():
+    assert _keyword_hits("the cat sat", Counter(["cat", "dog"])) is None
+
+
+def test_term_inside_longer_word_counts():
+    assert _keyword_hits("cats and a cat", Counter(["cat", "cats"])) == 3
+
+
+def test_repeated_query_term_counts_per_repetition():
+    assert _keyword_hits("cat cat", Counter(["cat", "cat"])) == 4
@@ -17,10 +17,11 @@ logger = logging.getLogger(__name__)
 )
 def process_video(
     self,
-    file_content,
     filename: str,
     user_id: str,
     doc_id: str,
+    storage_path: str = None,
+    file_content=None,
 ):
     """
     Process a video:
@@ -32,8 +33,12 @@ def process_video(
     try:
         logger.info(f"Starting video processing: doc_id={doc_id}, filename={filename}")
 
-        # Handle hex-encoded file content from Celery
-        if isinstance(file_content, str):
+        if file_content is None:
+            # The backend uploads the video before queueing; fetch it from storage
+            from src.storage.supabase_service import get_supabase, VIDEO_BUCKET
+            file_content = get_supabase().storage.from_(VIDEO_BUCKET).download(storage_path)
+        elif isinstance(file_content, str):
+            # Hex-encoded content from tasks queued before videos went via storage
             file_content = bytes.fromhex(file_content)
 
         # Save video to temporary file
@@ -49,7 +54,7 @@ def process_video(
             # 4. Store in Pinecone with metadata
             
             logger.info(f"Video processing completed: doc_id={doc_id}")
-            return {
+            result = {
                 "status": "processed",
                 "doc_id": doc_id,
                 "filename": filename,
@@ -61,6 +66,18 @@ def process_video(
             # Clean up temporary video file
             if os.path.exists(tmp_video_path):
                 os.remove(tmp_video_path)
+
+        if storage_path is not None:
+            # The stored upload was only the handoff from the backend; once
+            # processed it isn't needed (on failure it stays for the retry and
+            # is removed when the document is deleted)
+            try:
+                from src.storage.supabase_service import get_supabase, VIDEO_BUCKET
+                get_supabase().storage.from_(VIDEO_BUCKET).remove([storage_path])
+            except Exception as e:
+                logger.warning(f"Failed to remove processed upload {storage_path}: {e}")
+
+        return result
         
     except Exception as exc:
         logger.error(f"Video processing failed: doc_id={doc_id}, error={exc}", exc_info=True)
@@ -264,17 +264,14 @@ async def upload_video(
 
         # Upload frames to Supabase storage and generate embeddings
         logger.info("Uploading frames to Supabase and generating embeddings...")
-        embeddings = []
+        # Embed all frames in batches, converting the stacked array to lists once
+        embeddings = clip_embedder.embed_images([frame for frame, _ in frames]).tolist()
         metadatas = []
         ids = []
 
         # Prepare all frame data first
         frame_upload_tasks = []
         for idx, (frame, timestamp) in enumerate(frames):
-            # Generate embedding
-            embedding = clip_embedder.embed_image(frame)
-            embeddings.append(embedding.tolist())
-
             # Prepare frame upload task
             frame_filename = f"{video_id}_frame_{idx}.jpg"
             frame_upload_tasks.append({
@@ -20,6 +20,24 @@ class CLIPEmbedder:
             features = features / features.norm(dim=-1, keepdim=True)
         return features.cpu().numpy().flatten()
 
+    def embed_images(self, images, batch_size=32):
+        """Embed many images in batches; returns an (n, dim) array of normalized rows."""
+        batches = []
+        for start in range(0, len(images), batch_size):
+            pil_images = [
+                Image.fromarray(image) if not isinstance(image, Image.Image) else image
+                for image in images[start:start + batch_size]
+            ]
+            inputs = self.processor(images=pil_images, return_tensors="pt")
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            with torch.no_grad():
+                features = self.model.get_image_features(**inputs)
+                features = features / features.norm(dim=-1, keepdim=True)
+            batches.append(features.cpu())
+        if not batches:
+            return torch.empty(0, self.model.config.projection_dim).numpy()
+        return torch.cat(batches).numpy()
+
     def embed_text(self, text):
         inputs = self.processor(text=[text], return_tensors="pt", padding=True)
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
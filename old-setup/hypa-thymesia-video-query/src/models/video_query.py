@@ -33,14 +33,11 @@ class VideoQuerySystem:
             scene_ids = self.video_processor.detect_scene_changes(frames, scene_threshold)
 
         print("Generating frame embeddings and indexing...")
-        embeddings = []
+        embeddings = self.embedder.embed_images([frame for frame, _ in frames]).tolist()
         metadatas = []
         ids = []
 
         for idx, (frame, timestamp) in enumerate(tqdm(frames)):
-            embedding = self.embedder.embed_image(frame)
-            embeddings.append(embedding.tolist())
-
             metadata = {
                 "video_id": video_id,
                 "timestamp": timestamp,
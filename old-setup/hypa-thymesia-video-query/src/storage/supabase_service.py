@@ -5,6 +5,7 @@ Follows the same structure as the main hypa-thymesia backend.
 import os
 from typing import Optional, Dict, Any, List
 from uuid import uuid4
+from urllib.parse import quote
 from datetime import datetime
 from supabase import create_client, Client
 from dotenv import load_dotenv
@@ -22,6 +23,9 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 VIDEO_BUCKET = os.getenv("VIDEO_BUCKET", "videos")
 VIDEO_FRAMES_BUCKET = os.getenv("VIDEO_FRAMES_BUCKET", "video-frames")
 
+# Public object URLs are deterministic, so they are built locally
+_PUBLIC_URL_PREFIX = f"{SUPABASE_URL.rstrip('/')}/storage/v1/object/public"
+
 # Initialize Supabase client with persistent connection pool
 _supabase_client: Optional[Client] = None
 
@@ -122,12 +126,9 @@ def get_video_public_url(
     Returns:
         Public URL if successful, None otherwise
     """
-    supabase = get_supabase()
-    try:
-        return supabase.storage.from_(bucket).get_public_url(filepath)
-    except Exception as e:
-        print(f"Error getting public URL: {e}")
+    if not filepath:
         return None
+    return f"{_PUBLIC_URL_PREFIX}/{bucket}/{quote(filepath.lstrip('/'), safe='/')}"
 
 
 # ============================================================================
@@ -163,23 +164,16 @@ def upload_frame_to_bucket(
     filename = f"frame_{frame_index:06d}.jpg"
     storage_path = f"{user_id}/{video_id}/{filename}"
 
+    # Upsert overwrites an existing frame in the same request
     try:
         supabase.storage.from_(bucket).upload(
             path=storage_path,
             file=frame_bytes,
-            file_options={"content-type": "image/jpeg"}
+            file_options={"content-type": "image/jpeg", "upsert": "true"}
         )
-    except Exception:
-        # Try update if upload fails (frame already exists)
-        try:
-            supabase.storage.from_(bucket).update(
-                path=storage_path,
-                file=frame_bytes,
-                file_options={"content-type": "image/jpeg"}
-            )
-        except Exception as e:
-            print(f"Error uploading frame: {e}")
-            raise
+    except Exception as e:
+        print(f"Error uploading frame: {e}")
+        raise
 
     return {
         "bucket": bucket,
@@ -232,23 +226,16 @@ def upload_frame(
     # Create path: user_id/video_id/filename
     storage_path = f"{user_id}/{video_id}/{frame_filename}"
 
+    # Upsert overwrites an existing frame in the same request
     try:
         supabase.storage.from_(bucket).upload(
             path=storage_path,
             file=frame_bytes,
-            file_options={"content-type": "image/jpeg"}
+            file_options={"content-type": "image/jpeg", "upsert": "true"}
         )
-    except Exception:
-        # Try update if upload fails (frame already exists)
-        try:
-            supabase.storage.from_(bucket).update(
-                path=storage_path,
-                file=frame_bytes,
-                file_options={"content-type": "image/jpeg"}
-            )
-        except Exception as e:
-            print(f"Error uploading frame: {e}")
-            raise
+    except Exception as e:
+        print(f"Error uploading frame: {e}")
+        raise
 
     return storage_path
 
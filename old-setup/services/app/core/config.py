@@ -14,6 +14,7 @@ class Settings(BaseSettings):
     OLLAMA_MODEL: str = "mistral"
     OLLAMA_TIMEOUT: int = 30
     OLLAMA_NUM_PARALLEL: int = 6
+    OLLAMA_BATCH_SIZE: int = 4  # Chunks per formatting request; tune together with OLLAMA_NUM_PARALLEL
 
     # Service settings
     SERVICE_NAME: str = "formatting-microservice"
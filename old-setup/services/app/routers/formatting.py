@@ -3,7 +3,9 @@ Formatting API endpoints for the microservice.
 """
 
 import asyncio
+import contextlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 from fastapi import APIRouter, HTTPException
@@ -23,6 +25,14 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/formatting", tags=["formatting"])
 
+# Dedicated pool for blocking Ollama calls, sized to Ollama's parallelism and
+# shared by all requests, so formatting neither queues behind nor starves
+# other users of the default executor
+_format_pool = ThreadPoolExecutor(
+    max_workers=get_settings().OLLAMA_NUM_PARALLEL,
+    thread_name_prefix="ollama",
+)
+
 
 @router.post("/format-chunk", response_model=FormatChunkResponse)
 async def format_single_chunk(req: FormatChunkRequest):
@@ -40,10 +50,10 @@ async def format_single_chunk(req: FormatChunkRequest):
     try:
         formatter = get_formatter()
 
-        # Run formatting in executor to not block event loop
-        loop = asyncio.get_event_loop()
+        # Run formatting in the Ollama pool to not block event loop
+        loop = asyncio.get_running_loop()
         formatted_text = await loop.run_in_executor(
-            None, formatter.format_chunk, req.text
+            _format_pool, formatter.format_chunk, req.text
         )
 
         if formatted_text:
@@ -77,6 +87,10 @@ async def batch_format_chunks(req: BatchFormatRequest):
     """
     Format multiple text chunks concurrently.
 
+    Chunks are grouped batch_size at a time into a single Ollama request, and
+    the groups run concurrently; throughput depends on the product of the two,
+    so tune OLLAMA_BATCH_SIZE together with OLLAMA_NUM_PARALLEL.
+
     Args:
         req: Request containing list of chunks with chunk_id and text
 
@@ -87,17 +101,27 @@ async def batch_format_chunks(req: BatchFormatRequest):
 
     settings = get_settings()
     max_concurrent = req.max_concurrent or settings.OLLAMA_NUM_PARALLEL
+    batch_size = max(1, req.batch_size or settings.OLLAMA_BATCH_SIZE)
 
     formatter = get_formatter()
-    semaphore = asyncio.Semaphore(max_concurrent)
-
-    async def format_single(chunk_data: dict) -> ChunkResult:
-        """Format a single chunk with semaphore limiting."""
+    loop = asyncio.get_running_loop()
+
+    # The pool already bounds concurrency; a semaphore is only needed when this
+    # request asks for less parallelism than the pool provides
+    if max_concurrent < settings.OLLAMA_NUM_PARALLEL:
+        limit = asyncio.Semaphore(max_concurrent)
+    else:
+        limit = contextlib.nullcontext()
+
+    results: list[Optional[ChunkResult]] = [None] * len(req.chunks)
+    pending: list[tuple[int, str, str]] = []
+    for i, chunk_data in enumerate(req.chunks):
         chunk_id = chunk_data.get("chunk_id", "unknown")
         text = chunk_data.get("text", "")
-
-        if not text:
-            return ChunkResult(
+        if text:
+            pending.append((i, chunk_id, text))
+        else:
+            results[i] = ChunkResult(
                 chunk_id=chunk_id,
                 original_text=text,
                 formatted_text=None,
@@ -105,42 +129,33 @@ async def batch_format_chunks(req: BatchFormatRequest):
                 error="Empty text provided"
             )
 
-        async with semaphore:
+    async def format_group(group: list[tuple[int, str, str]]) -> None:
+        """Format one group of chunks with a single request in the Ollama pool."""
+        async with limit:
             try:
-                loop = asyncio.get_event_loop()
-                formatted_text = await loop.run_in_executor(
-                    None, formatter.format_chunk, text
+                # Failures are reported per chunk, so one bad chunk keeps the rest
+                outcomes = await loop.run_in_executor(
+                    _format_pool, formatter.format_chunks, [text for _, _, text in group]
                 )
-
-                if formatted_text:
-                    return ChunkResult(
-                        chunk_id=chunk_id,
-                        original_text=text,
-                        formatted_text=formatted_text,
-                        success=True
-                    )
-                else:
-                    return ChunkResult(
-                        chunk_id=chunk_id,
-                        original_text=text,
-                        formatted_text=None,
-                        success=False,
-                        error="Formatter returned empty result"
-                    )
-
             except Exception as e:
-                logger.error(f"Failed to format chunk {chunk_id}: {e}")
-                return ChunkResult(
-                    chunk_id=chunk_id,
-                    original_text=text,
-                    formatted_text=None,
-                    success=False,
-                    error=str(e)
-                )
+                logger.error(f"Failed to format chunks {[chunk_id for _, chunk_id, _ in group]}: {e}")
+                outcomes = [(None, str(e))] * len(group)
+
+        for (i, chunk_id, text), (formatted_text, error) in zip(group, outcomes):
+            if error:
+                logger.error(f"Failed to format chunk {chunk_id}: {error}")
+            results[i] = ChunkResult(
+                chunk_id=chunk_id,
+                original_text=text,
+                formatted_text=formatted_text,
+                success=formatted_text is not None,
+                error=error
+            )
 
-    # Execute all formatting tasks concurrently
-    results = await asyncio.gather(*[
-        format_single(chunk) for chunk in req.chunks
+    # Execute all formatting groups concurrently
+    await asyncio.gather(*[
+        format_group(pending[start:start + batch_size])
+        for start in range(0, len(pending), batch_size)
     ])
 
     formatted_count = sum(1 for r in results if r.success)
@@ -29,6 +29,10 @@ class BatchFormatRequest(BaseModel):
         default=10,
         description="Maximum concurrent formatting requests"
     )
+    batch_size: Optional[int] = Field(
+        default=None,
+        description="Chunks sent per formatting request (defaults to OLLAMA_BATCH_SIZE)"
+    )
 
 
 class ChunkResult(BaseModel):
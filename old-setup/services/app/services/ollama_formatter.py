@@ -106,6 +106,16 @@ Why bad: This breaks the sentence structure and invents structure not present in
 Now format the user's text following the rules above. Output ONLY the formatted text with no tags or explanations.
 </instructions>"""
 
+    # Appended to SYSTEM_PROMPT when several chunks share one request
+    BATCH_PROMPT = """
+
+<batch_rules>
+The input contains several numbered <section id="N"> blocks. Format each section independently using the rules above.
+Wrap each formatted section in the same <section id="N"> and </section> tags, in the same order. These are the only tags allowed in the output.
+</batch_rules>"""
+
+    _SECTION_RE = re.compile(r'<section id="(\d+)">(.*?)</section>', re.DOTALL)
+
     def __init__(
         self,
         model: str = None,
@@ -131,6 +141,74 @@ Now format the user's text following the rules above. Output ONLY the formatted
             f"base_url={self.base_url}"
         )
 
+    def _clean_output(self, text: str, content: str) -> str:
+        """Strip code fences, commentary and trailing extras from a model reply for one chunk."""
+        formatted_text = content.strip()
+
+        # Remove code fences if present (various formats)
+        if formatted_text.startswith("```"):
+            lines = formatted_text.split("\n")
+            # Remove first line (opening fence)
+            if lines[0].startswith("```"):
+                lines = lines[1:]
+            # Remove last line if it's a closing fence
+            if lines and lines[-1].strip() == "```":
+                lines = lines[:-1]
+            formatted_text = "\n".join(lines).strip()
+
+        # Also remove inline code blocks that might wrap the entire output
+        if formatted_text.startswith("`") and formatted_text.endswith("`"):
+            formatted_text = formatted_text.strip("`").strip()
+
+        # Remove common commentary patterns
+        lines = formatted_text.split("\n")
+
+        # Skip opening commentary lines
+        start_idx = 0
+        for i, line in enumerate(lines):
+            lower = line.lower().strip()
+            if any(p in lower for p in ["here's", "here is", "i've formatted", "formatted version"]):
+                start_idx = i + 1
+            elif line.strip():  # Hit actual content
+                break
+
+        if start_idx > 0:
+            lines = lines[start_idx:]
+
+        # Remove closing commentary lines
+        cleaned_lines = []
+        for line in lines:
+            lower = line.lower().strip()
+            # Skip standalone commentary in parentheses or brackets
+            if ((lower.startswith("(") and lower.endswith(")")) or
+                (lower.startswith("[") and lower.endswith("]"))):
+                if any(p in lower for p in ["formatted", "readability", "preserved", "unchanged"]):
+                    continue
+            # Skip "Note:" commentary
+            if lower.startswith("note:"):
+                continue
+            cleaned_lines.append(line)
+
+        formatted_text = "\n".join(cleaned_lines).strip()
+
+        # Auto-cutoff: Find where original text ends and trim extra content
+        # Extract last 5-10 words from original text
+        original_words = re.findall(r'\w+', text.lower())
+        if len(original_words) >= 5:
+            # Look for the last few words in the formatted output
+            last_words = original_words[-5:]  # Last 5 words
+            last_word_pattern = r'\b' + r'\W+'.join(re.escape(w) for w in last_words) + r'\b'
+
+            match = re.search(last_word_pattern, formatted_text.lower())
+            if match:
+                # Found the end position - cut off everything after
+                cutoff_pos = match.end()
+                # Find the actual position in the original casing
+                formatted_text = formatted_text[:cutoff_pos].strip()
+                logger.debug(f"Auto-cutoff applied at position {cutoff_pos}")
+
+        return formatted_text
+
     def format_chunk(self, text: str) -> Optional[str]:
         """
         Format a single text chunk using Ollama.
@@ -162,69 +240,7 @@ Now format the user's text following the rules above. Output ONLY the formatted
                 }
             )
 
-            formatted_text = response["message"]["content"].strip()
-
-            # Remove code fences if present (various formats)
-            if formatted_text.startswith("```"):
-                lines = formatted_text.split("\n")
-                # Remove first line (opening fence)
-                if lines[0].startswith("```"):
-                    lines = lines[1:]
-                # Remove last line if it's a closing fence
-                if lines and lines[-1].strip() == "```":
-                    lines = lines[:-1]
-                formatted_text = "\n".join(lines).strip()
-
-            # Also remove inline code blocks that might wrap the entire output
-            if formatted_text.startswith("`") and formatted_text.endswith("`"):
-                formatted_text = formatted_text.strip("`").strip()
-
-            # Remove common commentary patterns
-            lines = formatted_text.split("\n")
-
-            # Skip opening commentary lines
-            start_idx = 0
-            for i, line in enumerate(lines):
-                lower = line.lower().strip()
-                if any(p in lower for p in ["here's", "here is", "i've formatted", "formatted version"]):
-                    start_idx = i + 1
-                elif line.strip():  # Hit actual content
-                    break
-
-            if start_idx > 0:
-                lines = lines[start_idx:]
-
-            # Remove closing commentary lines
-            cleaned_lines = []
-            for line in lines:
-                lower = line.lower().strip()
-                # Skip standalone commentary in parentheses or brackets
-                if ((lower.startswith("(") and lower.endswith(")")) or
-                    (lower.startswith("[") and lower.endswith("]"))):
-                    if any(p in lower for p in ["formatted", "readability", "preserved", "unchanged"]):
-                        continue
-                # Skip "Note:" commentary
-                if lower.startswith("note:"):
-                    continue
-                cleaned_lines.append(line)
-
-            formatted_text = "\n".join(cleaned_lines).strip()
-
-            # Auto-cutoff: Find where original text ends and trim extra content
-            # Extract last 5-10 words from original text
-            original_words = re.findall(r'\w+', text.lower())
-            if len(original_words) >= 5:
-                # Look for the last few words in the formatted output
-                last_words = original_words[-5:]  # Last 5 words
-                last_word_pattern = r'\b' + r'\W+'.join(re.escape(w) for w in last_words) + r'\b'
-
-                match = re.search(last_word_pattern, formatted_text.lower())
-                if match:
-                    # Found the end position - cut off everything after
-                    cutoff_pos = match.end()
-                    # Find the actual position in the original casing
-                    formatted_text = formatted_text[:cutoff_pos].strip()
-                    logger.debug(f"Auto-cutoff applied at position {cutoff_pos}")
+            formatted_text = self._clean_output(text, response["message"]["content"])
 
             logger.debug(f"Successfully formatted chunk ({len(formatted_text)} chars)")
             return formatted_text
@@ -233,6 +249,77 @@ Now format the user's text following the rules above. Output ONLY the formatted
             logger.error(f"Failed to format chunk: {e}", exc_info=True)
             raise
 
+    def _format_sections(self, texts: list[str]) -> dict[int, str]:
+        """Send texts as numbered sections in one request; returns the raw reply per section."""
+        logger.debug(f"Formatting {len(texts)} chunks in one request")
+
+        user_content = "\n\n".join(
+            f'<section id="{i}">\n{text}\n</section>' for i, text in enumerate(texts)
+        )
+        try:
+            response = self.client.chat(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": self.SYSTEM_PROMPT + self.BATCH_PROMPT},
+                    {"role": "user", "content": user_content}
+                ],
+                options={
+                    "temperature": 0.2,
+                    "top_p": 0.9,
+                    "num_predict": len(user_content) * 2,
+                    "stop": ["</output>", "\n\n---"],
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Batched formatting failed, formatting chunks one by one: {e}")
+            return {}
+
+        return {
+            int(m.group(1)): m.group(2)
+            for m in self._SECTION_RE.finditer(response["message"]["content"])
+        }
+
+    def format_chunks(self, texts: list[str]) -> list[tuple[Optional[str], Optional[str]]]:
+        """
+        Format several text chunks with a single Ollama request.
+
+        The chunks are sent as numbered sections and the reply is split back
+        per section. A section that is missing from the reply or no longer
+        holds exactly its input's words is formatted again on its own, so
+        batching never lets one chunk's text bleed into another. A failed
+        retry only fails that chunk; the other sections are kept.
+
+        Args:
+            texts: Raw text chunks to format (non-empty)
+
+        Returns:
+            (formatted_text, error) for each chunk, in input order; exactly
+            one of the two is None
+        """
+        # A single chunk skips the batched request and is formatted below
+        sections = self._format_sections(texts) if len(texts) > 1 else {}
+
+        results: list[tuple[Optional[str], Optional[str]]] = []
+        for i, text in enumerate(texts):
+            if i in sections:
+                formatted_text = self._clean_output(text, sections[i])
+                valid, reason = self._validate_word_preservation(text, formatted_text)
+                if valid and formatted_text:
+                    results.append((formatted_text, None))
+                    continue
+                logger.debug(f"Section {i} rejected ({reason}), retrying alone")
+            try:
+                formatted_text = self.format_chunk(text)
+            except Exception as e:
+                results.append((None, str(e)))
+                continue
+            if formatted_text:
+                results.append((formatted_text, None))
+            else:
+                results.append((None, "Formatter returned empty result"))
+
+        return results
+
 
 def get_formatter() -> OllamaFormatter:
     """Get a singleton instance of OllamaFormatter."""